@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Benchmark the 3MF object serializer: per-vertex f-string loop vs vectorized.
+
+Builds a few representative name tags with the mesh engine and reports the
+serialization cost per face and the resulting object size for each precision.
+Run from the repository root.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.generator.generate_3d_text import Generate3DInput, _mesh_to_object_model
+from src.generator.mesh_engine import build_mesh_geometry
+from bench_util import best_of
+
+CASES = [
+    dict(text="Hi"),
+    dict(text="Kamyar", addOutline=True, fillBorder=True),
+    dict(text="Wolt Berlin\nPlatform Team", addOutline=True, outlineWidth=2.0),
+]
+
+
+def legacy_object_model(mesh, obj_id, uuid_str):
+    # The original implementation: one f-string per vertex/triangle, repr floats.
+    lines = [f'  <object id="{obj_id}" p:UUID="{uuid_str}" type="model">']
+    for v in mesh.vertices:
+        lines.append(f'     <vertex x="{v[0]}" y="{v[1]}" z="{v[2]}"/>')
+    for f in mesh.faces:
+        lines.append(f'     <triangle v1="{f[0]}" v2="{f[1]}" v3="{f[2]}"/>')
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    for case in CASES:
+        text_mesh, border_mesh, _ = build_mesh_geometry(Generate3DInput(font="Omnes Medium", **case))
+        mesh = border_mesh if border_mesh is not None else text_mesh
+        n = len(mesh.faces)
+        print(f"{case['text']!r}: {len(mesh.vertices)} vertices, {n} faces")
+
+        t, xml = best_of(lambda: legacy_object_model(mesh, 1, "uuid"))
+        print(f"  legacy      {t * 1e6 / n:6.2f} us/face  {len(xml) / 1024:8.1f} KiB")
+        for precision in (3, 5, 7):
+            t, xml = best_of(lambda: _mesh_to_object_model(mesh, 1, "uuid", precision))
+            print(f"  precision {precision} {t * 1e6 / n:6.2f} us/face  {len(xml) / 1024:8.1f} KiB")
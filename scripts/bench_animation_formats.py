@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Benchmark the typewriter animation encoders: GIF vs animated WebP vs APNG.
+
+Renders a few representative emoji texts and reports the encode time and the
+output size per frame for each format and setting. Frames are rendered once up
+front, so only the encoders are timed. Run from the repository root.
+"""
+import os
+import sys
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.generator import generate_picture
+from src.generator.generate_picture import GenerateInput, make_animation, typewriter_frames
+from bench_util import best_of
+
+CASES = [
+    dict(text="LGTM"),
+    dict(text="SHIP IT", platform="doordash"),
+    dict(text="THANKS FOR\nTHE PIZZA", platform="deliveroo"),
+]
+
+SETTINGS = [
+    ("gif full", dict(format="gif", gifEncoding="full")),
+    ("gif delta", dict(format="gif", gifEncoding="delta")),
+    ("webp q80 m4", dict(format="webp", webpQuality=80, webpMethod=4)),
+    ("webp q50 m0", dict(format="webp", webpQuality=50, webpMethod=0)),
+    ("webp lossless", dict(format="webp", webpLossless=True, webpMethod=4)),
+    ("apng level 6", dict(format="apng", apngCompressLevel=6)),
+    ("apng level 1", dict(format="apng", apngCompressLevel=1)),
+]
+
+
+if __name__ == "__main__":
+    for case in CASES:
+        data = GenerateInput(gif=True, **case)
+        frames = list(typewriter_frames(data))
+        n = len(frames)
+        print(f"{case['text']!r} ({data.platform}): {n} frames")
+
+        def replay(_):
+            return iter(frames)
+
+        with mock.patch.object(generate_picture, "typewriter_frames", replay):
+            for label, settings in SETTINGS:
+                t, buf = best_of(lambda: make_animation(data.model_copy(update=settings)))
+                size = len(buf.getvalue())
+                print(f"  {label:14} {t * 1e3 / n:6.2f} ms/frame  {size / n / 1024:6.2f} KiB/frame"
+                      f"  {size / 1024:7.1f} KiB")
@@ -0,0 +1,12 @@
+"""Timing helper shared by the benchmark scripts in this directory."""
+import time
+
+
+def best_of(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times; return (fastest wall time in seconds, last result)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
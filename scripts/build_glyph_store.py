@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""Precompile glyph faces for every bundled font into the on-disk glyph store.
+
+Used as a Docker build step so all uvicorn workers start with a warm store.
+Run from the repository root (or with it on PYTHONPATH).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.generator import glyph_store
+from src.generator.font_manager import get_available_fonts
+from src.generator.generate_3d_text import _GLYPH_UNIT_SIZE
+
+
+if __name__ == "__main__":
+    fonts = get_available_fonts()
+    count = glyph_store.build_store(
+        list(fonts.values()), glyph_store.PRECOMPILED_CHARS, _GLYPH_UNIT_SIZE)
+    print(f"  {count} glyphs written for {len(fonts)} fonts to {glyph_store.GLYPH_STORE_DIR}")
@@ -0,0 +1,477 @@
+"""Byte- and TTL-bounded stores for generated files served by the temp endpoints.
+
+Three backends share one interface:
+
+- ``MemoryArtifactStore`` keeps artifacts in a per-process LRU dict.
+- ``DirectoryArtifactStore`` writes them to a local directory (``/dev/shm`` when
+  available) and serves them as memory-mapped files, so every worker on the host
+  sees every artifact and eviction is shared.
+- ``TieredArtifactStore`` is a memory store that spills entries evicted for space
+  to a directory store on disk instead of dropping them.
+
+Entries expire when they have not been written or read for ``ttl`` seconds, and
+least recently used entries are evicted once ``max_bytes`` is exceeded.
+
+``sink(key)`` returns a writer for artifacts produced in chunks: they are written
+straight into what becomes the stored artifact (an unlinked, memory-mapped
+scratch file for the memory backend, the final file for the directory backend)
+instead of being joined in memory first. ``commit`` stores it, ``abort`` drops it.
+
+``put`` accepts an optional ``release`` callback for data backed by a resource
+(such as a worker's shared memory segment). The store calls it once it no longer
+needs ``data``: on eviction, expiry or replacement for the memory backend, and
+right after the bytes are written for the directory backend.
+"""
+import logging
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("artifacts")
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+def _nbytes(data) -> int:
+    return memoryview(data).nbytes
+
+
+def _scratch_dir() -> str:
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def _close_mapping(mapping: mmap.mmap) -> None:
+    try:
+        mapping.close()
+    except BufferError:
+        # Views are still being served; the mapping goes away with the last of them.
+        pass
+
+
+class _MemorySink:
+    """Writes an artifact to an unlinked scratch file and stores it memory-mapped."""
+
+    def __init__(self, store: "MemoryArtifactStore", key: str):
+        self._store = store
+        self._key = key
+        self._file = tempfile.TemporaryFile(dir=_scratch_dir())
+
+    def write(self, chunk) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> None:
+        with self._file:
+            self._file.flush()
+            if self._file.tell() == 0:
+                self._store.put(self._key, b"")
+                return
+            mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._store.put(self._key, memoryview(mapping),
+                        release=lambda: _close_mapping(mapping))
+
+    def abort(self) -> None:
+        try:
+            self._file.close()
+        except OSError:
+            # Flushing what is being discarded failed (e.g. a full disk).
+            pass
+
+
+class _FileSink:
+    """Writes an artifact to a temporary file and renames it into place on commit."""
+
+    def __init__(self, store: "DirectoryArtifactStore", path: str):
+        self._store = store
+        self._path = path
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.directory, prefix=".", suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> None:
+        try:
+            size = self._file.tell()
+            self._file.close()
+            os.replace(self._tmp_path, self._path)
+        except BaseException:
+            self.abort()
+            raise
+        self._store._stored(size)
+
+    def abort(self) -> None:
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
+
+
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "puts": self.puts,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class MemoryArtifactStore:
+    """Per-process artifact store."""
+
+    backend = "memory"
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._releases: dict[str, object] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.metrics = _Metrics()
+
+    def put(self, key: str, data, release=None) -> None:
+        now = time.time()
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = (data, now)
+            self._bytes += _nbytes(data)
+            if release is not None:
+                self._releases[key] = release
+            evicted = self._evict(now)
+        self.metrics.incr("puts")
+        self._spill(evicted)
+
+    def sink(self, key: str) -> _MemorySink:
+        return _MemorySink(self, key)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now - entry[1] > self.ttl:
+                self._discard(key)
+                self.metrics.incr("expired")
+                entry = None
+            if entry is None:
+                self.metrics.incr("misses")
+                return None
+            self._data[key] = (entry[0], now)
+            self._data.move_to_end(key)
+        self.metrics.incr("hits")
+        data = entry[0]
+        # Each reader gets its own view, so releasing the entry's buffer on
+        # eviction cannot invalidate a view that is still being served.
+        return data[:] if isinstance(data, memoryview) else data
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = len(self._data), self._bytes
+        return {"backend": self.backend, "entries": entries, "bytes": size,
+                "max_bytes": self.max_bytes, "ttl": self.ttl, **self.metrics.as_dict()}
+
+    def close(self) -> None:
+        """Drop every entry, releasing the resources behind them."""
+        with self._lock:
+            for key in list(self._data):
+                self._discard(key)
+
+    def _remove(self, key: str) -> tuple:
+        data, _ = self._data.pop(key)
+        self._bytes -= _nbytes(data)
+        return data, self._releases.pop(key, None)
+
+    def _discard(self, key: str) -> None:
+        _, release = self._remove(key)
+        if release is not None:
+            release()
+
+    def _evict(self, now: float) -> list:
+        """Drop expired and over-budget entries; return the latter for _spill."""
+        evicted = []
+        # Oldest access first, so expired entries sit at the front.
+        while self._data:
+            key, (data, accessed) = next(iter(self._data.items()))
+            if now - accessed > self.ttl:
+                self._discard(key)
+                self.metrics.incr("expired")
+            elif self._bytes > self.max_bytes:
+                evicted.append((key, *self._remove(key)))
+                self.metrics.incr("evictions")
+            else:
+                break
+        return evicted
+
+    def _spill(self, evicted: list) -> None:
+        for _, _, release in evicted:
+            if release is not None:
+                release()
+
+
+class DirectoryArtifactStore:
+    """Artifact store shared by all processes that point at the same directory.
+
+    Files are written to a temporary name and renamed into place, so readers in
+    other workers never see partial data. A file's mtime records its last access
+    and drives both TTL expiry and LRU eviction.
+
+    Scanning the directory costs O(entries), so ``put`` does not: it adds to a
+    running estimate of the directory size and only scans once that exceeds
+    ``max_bytes``, then evicts down to EVICT_TO of it so the next puts fit.
+    A background thread scans every ``sweep_interval`` seconds to drop expired
+    files and to correct the estimate for files other processes wrote or removed;
+    ``stats`` reports the estimate rather than scanning. Scans also delete
+    temporary files untouched for longer than the TTL, which a process that died
+    mid-write leaves behind.
+    """
+
+    backend = "directory"
+
+    # Fraction of max_bytes an over-budget scan evicts down to.
+    EVICT_TO = 0.9
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float,
+                 sweep_interval: float = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.metrics = _Metrics()
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        entries = self._scan()
+        self._bytes = sum(size for _, size, _ in entries)
+        self._entries = len(entries)
+        self._closed = threading.Event()
+        self._sweeper = None
+
+    def _path(self, key: str) -> str | None:
+        if not _KEY_RE.match(key):
+            return None
+        return os.path.join(self.directory, key)
+
+    def put(self, key: str, data, release=None) -> None:
+        try:
+            sink = self.sink(key)
+            try:
+                sink.write(data)
+            except BaseException:
+                sink.abort()
+                raise
+            sink.commit()
+        finally:
+            # The file is the artifact from here on.
+            if release is not None:
+                release()
+
+    def sink(self, key: str) -> _FileSink:
+        path = self._path(key)
+        if path is None:
+            raise ValueError(f"Invalid artifact key: {key!r}")
+        return _FileSink(self, path)
+
+    def _stored(self, size: int) -> None:
+        self.metrics.incr("puts")
+        with self._lock:
+            # Replacing a key counts twice; the next scan corrects the estimate.
+            self._bytes += size
+            self._entries += 1
+            over_budget = self._bytes > self.max_bytes
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True,
+                                                 name="artifact-sweeper")
+                self._sweeper.start()
+        if over_budget:
+            self._evict()
+
+    def get(self, key: str):
+        """Return the artifact as a read-only memoryview over the mapped file."""
+        path = self._path(key)
+        if path is None:
+            self.metrics.incr("misses")
+            return None
+        try:
+            with open(path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if time.time() - st.st_mtime > self.ttl:
+                    self._unlink(path)
+                    self.metrics.incr("expired")
+                    self.metrics.incr("misses")
+                    return None
+                os.utime(f.fileno())
+                if st.st_size == 0:
+                    data = memoryview(b"")
+                else:
+                    # The mapping outlives the file descriptor and is released
+                    # when the last view of it is garbage collected.
+                    data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            self.metrics.incr("misses")
+            return None
+        self.metrics.incr("hits")
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._entries, self._bytes
+        return {"backend": self.backend, "directory": self.directory,
+                "entries": entries, "bytes": size,
+                "max_bytes": self.max_bytes, "ttl": self.ttl, **self.metrics.as_dict()}
+
+    def close(self) -> None:
+        # Files outlive the process; other workers may still serve them.
+        self._closed.set()
+
+    def _sweep_loop(self) -> None:
+        while not self._closed.wait(self.sweep_interval):
+            try:
+                self._evict()
+            except Exception:
+                logger.exception("sweeping artifact directory %s failed", self.directory)
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        """Return (mtime, size, path) of every artifact; delete stale temporary files."""
+        now = time.time()
+        entries = []
+        orphans = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if not entry.name.startswith("."):
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                elif entry.name.endswith(".tmp") and now - st.st_mtime > self.ttl:
+                    # A sink still writing touches its file; this one was abandoned.
+                    orphans += self._unlink(entry.path)
+        if orphans:
+            logger.warning("removed %d abandoned temporary files from %s", orphans, self.directory)
+        return entries
+
+    def _unlink(self, path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            # Another worker evicted it first.
+            return False
+
+    def _evict(self) -> None:
+        """Scan the directory: drop expired files, then evict down to EVICT_TO if over budget."""
+        now = time.time()
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.EVICT_TO if total > self.max_bytes else total
+        removed = 0
+        for mtime, size, path in entries:
+            if now - mtime > self.ttl:
+                reason = "expired"
+            elif total > target:
+                reason = "evictions"
+            else:
+                break
+            if self._unlink(path):
+                self.metrics.incr(reason)
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+            self._entries = len(entries) - removed
+
+
+class TieredArtifactStore(MemoryArtifactStore):
+    """Memory store backed by a directory store for what does not fit in memory.
+
+    Entries evicted from memory for space are written to ``spill`` rather than
+    dropped, and lookups that miss memory fall through to it. Expired entries
+    are dropped from both tiers by their own TTLs.
+    """
+
+    backend = "tiered"
+
+    def __init__(self, max_bytes: int, ttl: float, spill: DirectoryArtifactStore):
+        super().__init__(max_bytes, ttl)
+        self.spill = spill
+
+    def get(self, key: str):
+        data = super().get(key)
+        if data is None:
+            data = self.spill.get(key)
+        return data
+
+    def stats(self) -> dict:
+        return {**super().stats(), "spill": self.spill.stats()}
+
+    def close(self) -> None:
+        super().close()
+        self.spill.close()
+
+    def _spill(self, evicted: list) -> None:
+        for key, data, release in evicted:
+            try:
+                self.spill.put(key, data, release=release)
+            except Exception:
+                logger.exception("spilling artifact %s failed", key)
+
+
+def _default_directory() -> str:
+    return os.path.join(_scratch_dir(), "emoji-maker-artifacts")
+
+
+def create_store():
+    """Build the store configured by the ARTIFACT_STORE* environment variables.
+
+    ARTIFACT_STORE selects "memory", "tiered" or "directory"; it defaults to
+    "directory" when uvicorn runs several workers (WEB_CONCURRENCY > 1) and to
+    "tiered" otherwise. The tiered store spills to ARTIFACT_STORE_SPILL_DIR
+    (under the system temp directory by default, so on disk rather than in
+    /dev/shm), bounded by ARTIFACT_STORE_SPILL_MAX_BYTES.
+    """
+    max_bytes = int(os.environ.get("ARTIFACT_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+    ttl = float(os.environ.get("ARTIFACT_STORE_TTL", "3600"))
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1") or "1")
+    backend = os.environ.get("ARTIFACT_STORE", "directory" if workers > 1 else "tiered")
+    if backend == "directory":
+        directory = os.environ.get("ARTIFACT_STORE_DIR") or _default_directory()
+        logger.info("artifact store: directory %s, max %d bytes, ttl %.0fs",
+                    directory, max_bytes, ttl)
+        return DirectoryArtifactStore(directory, max_bytes, ttl)
+    if backend == "tiered":
+        spill_dir = (os.environ.get("ARTIFACT_STORE_SPILL_DIR")
+                     or os.path.join(tempfile.gettempdir(), "emoji-maker-spill"))
+        spill_bytes = int(os.environ.get("ARTIFACT_STORE_SPILL_MAX_BYTES",
+                                         str(4 * 1024 * 1024 * 1024)))
+        logger.info("artifact store: memory, max %d bytes, spilling to %s, max %d bytes, ttl %.0fs",
+                    max_bytes, spill_dir, spill_bytes, ttl)
+        return TieredArtifactStore(max_bytes, ttl,
+                                   DirectoryArtifactStore(spill_dir, spill_bytes, ttl))
+    if backend != "memory":
+        raise ValueError(f"Unknown ARTIFACT_STORE backend: {backend!r}")
+    logger.info("artifact store: memory, max %d bytes, ttl %.0fs", max_bytes, ttl)
+    return MemoryArtifactStore(max_bytes, ttl)
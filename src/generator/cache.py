@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and an estimated byte size."""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int | None = None,
+                 name: str = "cache"):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int = 0) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any],
+                      sizeof: Callable[[Any], int] | None = None) -> Any:
+        """Return the cached value for ``key``, building it with ``factory`` on a miss.
+
+        The factory runs outside the lock, so two threads missing on the same key
+        may both build it; the last one stored wins, which is harmless for pure
+        values like glyph geometry.
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+        value = factory()
+        self.put(key, value, sizeof(value) if sizeof else 0)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+def merge_stats(reports: list[dict[str, dict]]) -> dict[str, dict]:
+    """Combine per-process ``{name: LRUCache.stats()}`` reports into lane totals.
+
+    Counters and sizes are summed; limits are per process and taken as is.
+    """
+    merged = {}
+    for report in reports:
+        for name, stats in report.items():
+            total = merged.setdefault(name, {**stats, "processes": 0})
+            if total["processes"]:
+                for field in ("entries", "bytes", "hits", "misses", "evictions"):
+                    total[field] += stats[field]
+            total["processes"] += 1
+    for total in merged.values():
+        lookups = total["hits"] + total["misses"]
+        total["hit_rate"] = round(total["hits"] / lookups, 4) if lookups else 0.0
+    return merged
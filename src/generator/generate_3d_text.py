@@ -1,14 +1,19 @@
-import tempfile
+import itertools
 import os
 import logging
+import secrets
 import time
+from functools import cached_property
 from io import BytesIO
 from typing import Literal
 
 import cadquery as cq
 from pydantic import BaseModel, Field
 
+from src.generator.cache import LRUCache
 from src.generator.font_manager import get_font_path
+from src.generator import glyph_store
+from src.generator.glyph_outline import glyph_polygon
 
 logger = logging.getLogger("gen3d")
 
@@ -38,27 +43,116 @@ class Generate3DInput(BaseModel):
     scale: float = Field(default=1.0, ge=0.1, le=10.0)
     color: str = Field(default="#667eea", pattern=r"^#[0-9a-fA-F]{6}$")
     exportFormat: Literal["stl", "3mf"] = "stl"
+    engine: Literal["occt", "mesh"] | None = None
+    # 3MF only: store each distinct glyph once and place repeats as components.
+    instanceGlyphs: bool = False
 
 
-_char_cache = {}
+# Geometry engine used when a request does not pick one: "occt" builds BRep solids
+# with CadQuery, "mesh" builds triangle meshes directly (see mesh_engine).
+DEFAULT_ENGINE = os.environ.get("GEOMETRY_ENGINE", "occt")
 
 
-def _render_char(char: str, font_size: float, font_path: str, extrude_height: float):
-    key = (char, font_size, font_path, extrude_height)
-    if key in _char_cache:
-        return _char_cache[key]
+def _engine(input_data: Generate3DInput) -> str:
+    return input_data.engine or DEFAULT_ENGINE
+
+
+# Fields that only pick how a generation is delivered, not what is generated.
+_PRESENTATION_FIELDS = {"exportFormat"}
+
+# File ids are keyed with this secret so they cannot be derived from a guessed
+# request. Set FILE_ID_SECRET so all server processes (and restarts) agree on ids;
+# otherwise each process picks its own and only dedups its own requests.
+FILE_ID_SECRET = (os.environ.get("FILE_ID_SECRET", "").encode("utf-8")
+                  or secrets.token_bytes(32))
+
+
+def generation_key(input_data: Generate3DInput) -> str:
+    """Keyed content hash of a request; equal for requests that produce the same artifacts.
+
+    Presentation-only fields are left out, the engine is resolved to the one that
+    actually runs and colours are lower-cased, so e.g. an STL and a 3MF request
+    for the same tag share one key. The hash is an HMAC under FILE_ID_SECRET, so
+    knowing a request does not reveal its file id.
+    """
+    import hashlib
+    import hmac
+    import json
+    fields = input_data.model_dump(mode="json", exclude=_PRESENTATION_FIELDS)
+    fields["engine"] = _engine(input_data)
+    fields["color"] = fields["color"].lower()
+    fields["fillColor"] = fields["fillColor"].lower()
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+    return hmac.new(FILE_ID_SECRET, canonical.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+# Process-wide glyph cache shared by all requests. Glyphs are stored as flat faces
+# at _GLYPH_UNIT_SIZE and scaled/extruded per request, so entries do not depend on
+# fontSize or extrudeHeight. Budgets are configurable via GLYPH_CACHE_MAX_ENTRIES
+# and GLYPH_CACHE_MAX_BYTES (estimated, see _shape_size).
+_GLYPH_UNIT_SIZE = 100.0
+
+_char_cache = LRUCache(
+    max_entries=int(os.environ.get("GLYPH_CACHE_MAX_ENTRIES", "2048")),
+    max_bytes=int(os.environ.get("GLYPH_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    name="glyph",
+)
+
+
+def _shape_size(shape) -> int:
+    # OCCT does not expose allocation sizes, so approximate from the topology.
+    return 4096 + len(shape.Faces()) * 2048 + len(shape.Edges()) * 1024
+
+
+def _glyph_face(char: str, font_path: str):
+    key = (font_path, char)
+    face = _char_cache.get(key)
+    if face is not None:
+        return face
     t0 = time.time()
-    wp = cq.Workplane("front").text(char, font_size, extrude_height, fontPath=font_path)
-    solid = wp.val()
+    face = glyph_store.load_glyph(font_path, char, _GLYPH_UNIT_SIZE)
+    if face is None:
+        face = cq.Compound.makeText(char, _GLYPH_UNIT_SIZE, 0, fontPath=font_path)
+        glyph_store.save_glyph(font_path, char, _GLYPH_UNIT_SIZE, face)
+    logger.debug("_glyph_face %r: %.0fms", char, (time.time()-t0)*1000)
+    _char_cache.put(key, face, _shape_size(face))
+    return face
+
+
+def _render_char(char: str, font_size: float, font_path: str, extrude_height: float):
+    """Return the extruded glyph and its bounding box, or (None, None) if the font lacks it."""
+    from OCP.gp import gp_Trsf, gp_Pnt
+    from OCP.BRepBuilderAPI import BRepBuilderAPI_Transform
+    from OCP.BRepPrimAPI import BRepPrimAPI_MakePrism
+
+    face = _glyph_face(char, font_path)
+    if not face.Faces():
+        # Workplane.text skips characters the font has no glyph for; do the same.
+        return None, None
+    # Glyph outlines are linear in the font size and the solid is a straight
+    # prism, so a uniform scale plus extrusion reproduces Workplane.text exactly
+    # without converting the faces to NURBS as a non-uniform gp_GTrsf would.
+    trsf = gp_Trsf()
+    trsf.SetScale(gp_Pnt(0, 0, 0), font_size / _GLYPH_UNIT_SIZE)
+    scaled = BRepBuilderAPI_Transform(face.wrapped, trsf, True).Shape()
+    direction = face.Faces()[0].normalAt() * extrude_height
+    solid = cq.Shape.cast(BRepPrimAPI_MakePrism(scaled, direction.wrapped).Shape())
     bb = solid.BoundingBox()
-    logger.debug("_render_char %r: %.0fms  bb=(%.2f,%.2f)-(%.2f,%.2f)",
-                 char, (time.time()-t0)*1000, bb.xmin, bb.ymin, bb.xmax, bb.ymax)
-    _char_cache[key] = (solid, bb)
     return solid, bb
 
 
+def glyph_cache_stats() -> dict:
+    return _char_cache.stats()
+
+
 def _render_line(text: str, font_size: float, font_path: str,
-                 letter_spacing: float, extrude_height: float) -> tuple[list, float]:
+                 letter_spacing: float, extrude_height: float,
+                 placements: list | None = None) -> tuple[list, float]:
+    """Render one line from x=0 and return its solids and width.
+
+    When ``placements`` is given, (key, unplaced solid, x offset) is appended for
+    every returned solid so callers can instance repeated glyphs.
+    """
     if not text.strip():
         return [], 0.0
 
@@ -67,6 +161,9 @@ def _render_line(text: str, font_size: float, font_path: str,
             text, font_size, extrude_height, fontPath=font_path
         )
         bb = wp.val().BoundingBox()
+        if placements is not None:
+            # Workplane.text builds the whole line as one solid; instance it as a unit.
+            placements.append((text, wp.val(), 0.0))
         return [wp.val()], bb.xmax - bb.xmin
 
     solids = []
@@ -76,9 +173,13 @@ def _render_line(text: str, font_size: float, font_path: str,
             x += font_size * 0.3 + letter_spacing
             continue
         solid, bb = _render_char(char, font_size, font_path, extrude_height)
+        if solid is None:
+            continue
         char_width = bb.xmax - bb.xmin
         moved = solid.moved(cq.Location(cq.Vector(x - bb.xmin, 0, 0)))
         solids.append(moved)
+        if placements is not None:
+            placements.append((char, solid, x - bb.xmin))
         x += char_width + letter_spacing
 
     return solids, x
@@ -91,19 +192,7 @@ def _char_to_2d_polygon(char_solid, extrude_height):
     from shapely.ops import polygonize, unary_union
 
     t0 = time.time()
-    with tempfile.NamedTemporaryFile(suffix=".stl", delete=False) as f:
-        stl_path = f.name
-    try:
-        cq.exporters.export(
-            cq.Workplane("front").newObject([char_solid]),
-            stl_path, exportType="STL",
-        )
-        mesh = trimesh.load(stl_path, file_type="stl")
-    finally:
-        os.unlink(stl_path)
-
-    if isinstance(mesh, trimesh.Scene):
-        mesh = trimesh.util.concatenate(list(mesh.geometry.values()))
+    mesh = _tessellate(char_solid)
 
     lines3d = trimesh.intersections.mesh_plane(
         mesh, plane_normal=[0, 0, 1], plane_origin=[0, 0, extrude_height / 2]
@@ -135,6 +224,14 @@ def _char_to_2d_polygon(char_solid, extrude_height):
     return result
 
 
+def _fill_holes(poly):
+    # The outline hugs the outside of each glyph only, so counters are filled.
+    from shapely.geometry import Polygon
+    from shapely.ops import unary_union
+    parts = poly.geoms if poly.geom_type == "MultiPolygon" else [poly]
+    return unary_union([Polygon(p.exterior) for p in parts])
+
+
 def _build_outline_compound(cutter_compound, all_char_polys, outline_width, extrude_height):
     import trimesh
     from shapely.geometry import MultiPolygon
@@ -158,19 +255,7 @@ def _build_outline_compound(cutter_compound, all_char_polys, outline_width, extr
         outline_mesh = trimesh.creation.extrude_polygon(buffered, extrude_height)
     logger.debug("_build_outline: outline_mesh verts=%d faces=%d", len(outline_mesh.vertices), len(outline_mesh.faces))
 
-    with tempfile.NamedTemporaryFile(suffix=".stl", delete=False) as f:
-        cutter_path = f.name
-    try:
-        cq.exporters.export(
-            cq.Workplane("front").newObject([cutter_compound]),
-            cutter_path, exportType="STL",
-        )
-        cutter_mesh = trimesh.load(cutter_path, file_type="stl")
-    finally:
-        os.unlink(cutter_path)
-
-    if isinstance(cutter_mesh, trimesh.Scene):
-        cutter_mesh = trimesh.util.concatenate(list(cutter_mesh.geometry.values()))
+    cutter_mesh = _tessellate(cutter_compound)
     logger.debug("_build_outline: cutter_mesh verts=%d faces=%d", len(cutter_mesh.vertices), len(cutter_mesh.faces))
 
     result = trimesh.boolean.difference([outline_mesh, cutter_mesh], engine="manifold")
@@ -180,22 +265,62 @@ def _build_outline_compound(cutter_compound, all_char_polys, outline_width, extr
         return None
     logger.debug("_build_outline: result_mesh verts=%d faces=%d", len(result.vertices), len(result.faces))
 
-    with tempfile.NamedTemporaryFile(suffix=".stl", delete=False) as f:
-        out_path = f.name
-    try:
-        result.export(out_path, file_type="stl")
-        from OCP.StlAPI import StlAPI_Reader
-        from OCP.TopoDS import TopoDS_Shape as OCP_Shape
-        reader = StlAPI_Reader()
-        shape = OCP_Shape()
-        status = reader.Read(shape, out_path)
-        if not status or shape.IsNull():
-            logger.warning("_build_outline: StlAPI_Reader produced null shape (status=%s)", status)
-            return None
-        logger.debug("_build_outline: done %.0fms", (time.time()-t0)*1000)
-        return cq.Shape.cast(shape)
-    finally:
-        os.unlink(out_path)
+    shape = _mesh_to_shape(result)
+    logger.debug("_build_outline: done %.0fms", (time.time()-t0)*1000)
+    return shape
+
+
+def _mesh_to_shape(mesh):
+    """Wrap a triangle mesh in a single OCCT face carrying it as its triangulation.
+
+    StlAPI_Reader builds one planar face per triangle, which made every later
+    BRepMesh pass over the outline take seconds. A triangulation-only face is
+    reused as is, but it has no surface and cannot be transformed with
+    BRepBuilderAPI_Transform, so scaling is applied to the tessellated meshes.
+    """
+    from OCP.BRep import BRep_Builder
+    from OCP.Poly import Poly_Triangle, Poly_Triangulation
+    from OCP.TopoDS import TopoDS_Face
+    from OCP.gp import gp_Pnt
+
+    tri = Poly_Triangulation(len(mesh.vertices), len(mesh.faces), False)
+    for i, (x, y, z) in enumerate(mesh.vertices.tolist(), 1):
+        tri.SetNode(i, gp_Pnt(x, y, z))
+    for i, (a, b, c) in enumerate((mesh.faces + 1).tolist(), 1):
+        tri.SetTriangle(i, Poly_Triangle(a, b, c))
+    face = TopoDS_Face()
+    BRep_Builder().MakeFace(face, tri)
+    return cq.Shape.cast(face)
+
+
+class GlyphInstances:
+    """Distinct glyph bodies of the text part and the offset of each occurrence.
+
+    Filled by the geometry builders when ``instanceGlyphs`` is set. Bodies are
+    keyed by the text they render (a character, or a whole line when the line is
+    built as one solid) and may be OCCT shapes or trimesh meshes until
+    ``to_meshes`` tessellates and scales them for export.
+    """
+
+    def __init__(self):
+        self.bodies = {}
+        self.placements = []  # (key, (dx, dy, dz))
+
+    def add(self, key: str, body, offset) -> None:
+        self.bodies.setdefault(key, body)
+        self.placements.append((key, tuple(float(v) for v in offset)))
+
+    def to_meshes(self, scale: float = 1.0) -> "GlyphInstances":
+        import trimesh
+        result = GlyphInstances()
+        for key, body in self.bodies.items():
+            if isinstance(body, trimesh.Trimesh):
+                result.bodies[key] = body.copy().apply_scale(scale)
+            else:
+                result.bodies[key] = _tessellate(body, scale)
+        result.placements = [(key, tuple(v * scale for v in offset))
+                             for key, offset in self.placements]
+        return result
 
 
 class Generate3DResult(BaseModel):
@@ -235,40 +360,66 @@ def _create_gap_compound(all_solids, gap_percent, extrude_height):
     return cq.Compound.makeCompound(scaled)
 
 
-def _apply_scale(compound, scale):
-    if scale != 1.0:
-        from OCP.gp import gp_Trsf, gp_Pnt
-        from OCP.BRepBuilderAPI import BRepBuilderAPI_Transform
-        trsf = gp_Trsf()
-        trsf.SetScale(gp_Pnt(0, 0, 0), scale)
-        builder = BRepBuilderAPI_Transform(compound.wrapped, trsf, True)
-        compound = cq.Shape.cast(builder.Shape())
-    return compound
+# Intermediate results of _build_geometry, memoized per stage on just the inputs
+# the stage depends on, so a request that only changes a downstream parameter
+# (border padding, keychain corner, scale, colours) reuses the upstream shapes.
+# Keys are cumulative: each stage key extends the key of the stage it consumes.
+#
+# OCCT stores triangulations on the shapes themselves and BoundingBox reads them
+# when present, so a shape meshed by one request would measure differently in
+# the next. Cached BRep shapes are therefore never handed out: every request
+# works on copies, and a cache hit replays the meshing the skipped stage did on
+# its inputs. Results are the same whether a stage hits or not.
+_stage_cache = LRUCache(
+    max_entries=int(os.environ.get("STAGE_CACHE_MAX_ENTRIES", "128")),
+    max_bytes=int(os.environ.get("STAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    name="stage",
+)
 
 
-def _build_geometry(input_data: Generate3DInput):
-    t_start = time.time()
-    _char_cache.clear()
-    font_path = get_font_path(input_data.font)
-    if not font_path:
-        raise ValueError(f"Unknown font: {input_data.font}")
-    logger.debug("_build_geometry: font=%s path=%s", input_data.font, font_path)
+_MISSING = object()
+
+
+def stage_cache_stats() -> dict:
+    return _stage_cache.stats()
+
+
+def _shapes_size(shapes) -> int:
+    return sum(_shape_size(s) for s in shapes if s is not None)
+
+
+class _Layout:
+    """Positioned text solids of a request; the text compound is built from them."""
+
+    def __init__(self, lines, all_solids, max_width, line_height, placements):
+        self.lines = lines
+        self.all_solids = all_solids
+        self.max_width = max_width
+        self.line_height = line_height
+        # (key, unplaced body, (dx, dy, dz)) of every solid, for GlyphInstances.
+        self.placements = placements
 
+
+def _layout_stage(input_data: Generate3DInput, font_path: str) -> _Layout:
     lines = input_data.text.split("\n")
     line_results = []
 
+    line_placements = []
     for line in lines:
+        placements = []
         solids, width = _render_line(
             line, input_data.fontSize, font_path,
-            input_data.letterSpacing, input_data.extrudeHeight,
+            input_data.letterSpacing, input_data.extrudeHeight, placements,
         )
         line_results.append((solids, width))
+        line_placements.append(placements)
 
     max_width = max((w for _, w in line_results), default=0)
     if max_width == 0:
         raise ValueError("No visible characters in text")
 
     all_solids = []
+    placements = []
     line_height = input_data.fontSize + input_data.lineSpacing
 
     for line_idx, (solids, width) in enumerate(line_results):
@@ -283,60 +434,69 @@ def _build_geometry(input_data: Generate3DInput):
                 x_offset - bb.xmin, y_offset, 0
             )))
             all_solids.append(centered)
+            x_offset -= bb.xmin
         else:
             for solid in solids:
                 moved = solid.moved(cq.Location(cq.Vector(x_offset, y_offset, 0)))
                 all_solids.append(moved)
 
-    text_compound = cq.Compound.makeCompound(all_solids)
-    logger.debug("_build_geometry: %d solids positioned, max_width=%.2f", len(all_solids), max_width)
-    border_compound = None
-
-    gap_compound = None
-    if input_data.gap > 0:
-        gap_compound = _create_gap_compound(
-            all_solids, input_data.gap, input_data.extrudeHeight)
+        for key, body, dx in line_placements[line_idx]:
+            placements.append((key, body, (dx + x_offset, y_offset, 0.0)))
 
-    cutter_compound = gap_compound if gap_compound is not None else text_compound
-    logger.debug("_build_geometry: cutter=%s", "gap_compound" if gap_compound else "text_compound")
-
-    outline_compound = None
-    if input_data.addOutline:
-        from shapely import affinity
-        ow = input_data.outlineWidth
-        poly_cache = {}
-        all_char_polys = []
-        for li, line in enumerate(lines):
-            if not line.strip():
+    logger.debug("_build_geometry: %d solids positioned, max_width=%.2f", len(all_solids), max_width)
+    return _Layout(lines, all_solids, max_width, line_height, placements)
+
+
+def _outline_stage(input_data: Generate3DInput, font_path: str, layout: _Layout,
+                   cutter_compound):
+    from shapely import affinity
+    ow = input_data.outlineWidth
+    max_width = layout.max_width
+    line_height = layout.line_height
+    poly_cache = {}
+    all_char_polys = []
+    for li, line in enumerate(layout.lines):
+        if not line.strip():
+            continue
+        x = 0.0
+        line_polys = []
+        for char in line:
+            if char == " ":
+                x += input_data.fontSize * 0.3 + input_data.letterSpacing
                 continue
-            x = 0.0
-            line_polys = []
-            for char in line:
-                if char == " ":
-                    x += input_data.fontSize * 0.3 + input_data.letterSpacing
-                    continue
-                orig_solid, orig_bb = _render_char(
-                    char, input_data.fontSize, font_path, input_data.extrudeHeight)
-                orig_w = orig_bb.xmax - orig_bb.xmin
-                if char not in poly_cache:
-                    poly_cache[char] = _char_to_2d_polygon(
-                        orig_solid, input_data.extrudeHeight)
-                poly = poly_cache[char]
-                if poly is not None:
-                    line_polys.append(affinity.translate(poly, xoff=x - orig_bb.xmin))
-                x += orig_w + input_data.letterSpacing
-            line_width = x - input_data.letterSpacing if line_polys else 0.0
-            x_off = (max_width - line_width) / 2
-            y_off = -li * line_height
-            for p in line_polys:
-                all_char_polys.append(affinity.translate(p, xoff=x_off, yoff=y_off))
-
-        logger.debug("_build_geometry: %d char polys for outline", len(all_char_polys))
-        if all_char_polys:
-            outline_compound = _build_outline_compound(
-                cutter_compound, all_char_polys, ow, input_data.extrudeHeight)
-            logger.debug("_build_geometry: outline_compound=%s", "ok" if outline_compound else "None")
+            orig_solid, orig_bb = _render_char(
+                char, input_data.fontSize, font_path, input_data.extrudeHeight)
+            if orig_solid is None:
+                continue
+            orig_w = orig_bb.xmax - orig_bb.xmin
+            if char not in poly_cache:
+                poly = glyph_polygon(font_path, char, input_data.fontSize)
+                if poly is None:
+                    poly = _char_to_2d_polygon(orig_solid, input_data.extrudeHeight)
+                poly_cache[char] = _fill_holes(poly) if poly is not None else None
+            poly = poly_cache[char]
+            if poly is not None:
+                line_polys.append(affinity.translate(poly, xoff=x - orig_bb.xmin))
+            x += orig_w + input_data.letterSpacing
+        line_width = x - input_data.letterSpacing if line_polys else 0.0
+        x_off = (max_width - line_width) / 2
+        y_off = -li * line_height
+        for p in line_polys:
+            all_char_polys.append(affinity.translate(p, xoff=x_off, yoff=y_off))
+
+    logger.debug("_build_geometry: %d char polys for outline", len(all_char_polys))
+    if not all_char_polys:
+        return None
+    outline_compound = _build_outline_compound(
+        cutter_compound, all_char_polys, ow, input_data.extrudeHeight)
+    logger.debug("_build_geometry: outline_compound=%s", "ok" if outline_compound else "None")
+    return outline_compound
+
 
+def _border_stage(input_data: Generate3DInput, text_compound, cutter_compound,
+                  outline_compound):
+    """Return the border part (frame or filled plate, plus the outline) or None."""
+    border_compound = None
     if input_data.addBorder:
         text_bb = text_compound.BoundingBox()
         if outline_compound is not None:
@@ -418,21 +578,88 @@ def _build_geometry(input_data: Generate3DInput):
             border_compound = cq.Compound.makeCompound([border_compound, outline_compound])
         else:
             border_compound = outline_compound
+    return border_compound
 
-    text_compound = _apply_scale(text_compound, input_data.scale)
-    if border_compound is not None:
-        border_compound = _apply_scale(border_compound, input_data.scale)
 
-    if border_compound is not None:
-        combined = cq.Compound.makeCompound([border_compound, text_compound])
+def _stage_keys(input_data: Generate3DInput, font_path: str) -> dict:
+    """Cache key of every stage, built only from the inputs that reach it."""
+    layout = ("layout", input_data.text, font_path, input_data.fontSize,
+              input_data.letterSpacing, input_data.lineSpacing, input_data.extrudeHeight)
+    cutter = layout + ("cutter", input_data.gap)
+    outline = cutter + ("outline", input_data.addOutline and input_data.outlineWidth)
+    border = outline + ("border", input_data.addBorder)
+    if input_data.addBorder:
+        border += (input_data.borderPaddingTop, input_data.borderPaddingRight,
+                   input_data.borderPaddingBottom, input_data.borderPaddingLeft,
+                   input_data.fillBorder)
+        if input_data.fillBorder and input_data.keychainHole:
+            border += (input_data.keychainCorner, input_data.keychainRadius,
+                       input_data.keychainEdgeH, input_data.keychainEdgeV)
+    return {"layout": layout, "cutter": cutter, "outline": outline, "border": border}
+
+
+def _build_geometry(input_data: Generate3DInput, glyphs: GlyphInstances | None = None):
+    t_start = time.time()
+    font_path = get_font_path(input_data.font)
+    if not font_path:
+        raise ValueError(f"Unknown font: {input_data.font}")
+    logger.debug("_build_geometry: font=%s path=%s", input_data.font, font_path)
+    keys = _stage_keys(input_data, font_path)
+
+    layout = _stage_cache.get_or_create(
+        keys["layout"], lambda: _layout_stage(input_data, font_path),
+        lambda layout: _shapes_size(layout.all_solids))
+    all_solids = [solid.copy() for solid in layout.all_solids]
+    text_compound = cq.Compound.makeCompound(all_solids)
+    if glyphs is not None:
+        for key, body, offset in layout.placements:
+            # Bodies are meshed on export, so the cached ones are copied too.
+            if key not in glyphs.bodies:
+                body = body.copy()
+            glyphs.add(key, body, offset)
+
+    if input_data.gap > 0:
+        cutter_compound = _stage_cache.get_or_create(
+            keys["cutter"],
+            lambda: _create_gap_compound(all_solids, input_data.gap, input_data.extrudeHeight),
+            _shape_size).copy()
     else:
-        combined = text_compound
+        cutter_compound = text_compound
+    logger.debug("_build_geometry: cutter=%s", "gap_compound" if input_data.gap > 0 else "text_compound")
 
-    bb = combined.BoundingBox()
+    outline_compound = None
+    replay_outline_mesh = False
+    if input_data.addOutline:
+        # The outline is a triangulation-only face, so it is shared rather than copied.
+        outline_compound = _stage_cache.get(keys["outline"], _MISSING)
+        if outline_compound is _MISSING:
+            outline_compound = _outline_stage(input_data, font_path, layout, cutter_compound)
+            _stage_cache.put(keys["outline"], outline_compound, _shapes_size([outline_compound]))
+        else:
+            # _build_outline_compound meshed the cutter, which the border stage's
+            # bounding boxes see.
+            replay_outline_mesh = outline_compound is not None
+
+    def border_and_bbox():
+        if replay_outline_mesh:
+            _mesh_in_place(cutter_compound)
+        return _border_and_bbox(input_data, text_compound, cutter_compound, outline_compound)
+
+    # The border is used as is: it is only meshed, and identically by every request.
+    border_compound, bbox = _stage_cache.get_or_create(
+        keys["border"],
+        border_and_bbox,
+        lambda result: _shapes_size([result[0]]))
+
+    # Scaling is uniform about the origin, so it is applied to the tessellated
+    # meshes (see _tessellate and _build_meshes) and here to the bounding box,
+    # not to the BRep.
+    width, height, depth = bbox
+    scale = input_data.scale
     dimensions = Generate3DResult(
-        width=round(bb.xmax - bb.xmin, 2),
-        height=round(bb.ymax - bb.ymin, 2),
-        depth=round(bb.zmax - bb.zmin, 2),
+        width=round(width * scale, 2),
+        height=round(height * scale, 2),
+        depth=round(depth * scale, 2),
     )
 
     logger.info("_build_geometry: %.1fx%.1fx%.1fmm, total %.0fms",
@@ -440,130 +667,375 @@ def _build_geometry(input_data: Generate3DInput):
     return text_compound, border_compound, dimensions
 
 
-def _compound_to_workplane(compound):
-    return cq.Workplane("front").newObject([compound])
+def _build_meshes(input_data: Generate3DInput, glyphs: GlyphInstances | None = None):
+    """Run _build_geometry and tessellate both parts at the requested scale.
 
+    This is the last stage: meshes are memoized on the key of the stage that
+    built the part plus the scale, and returned as copies because exporters
+    colour them in place.
+    """
+    text_compound, border_compound, dimensions = _build_geometry(input_data, glyphs)
+    keys = _stage_keys(input_data, get_font_path(input_data.font))
+    text_mesh = _stage_mesh(keys["layout"], text_compound, input_data.scale)
+    border_mesh = (_stage_mesh(keys["border"], border_compound, input_data.scale)
+                   if border_compound is not None else None)
+    return text_mesh, border_mesh, dimensions
+
+
+def _stage_mesh(key: tuple, shape, scale: float):
+    mesh = _stage_cache.get_or_create(
+        key + ("mesh", scale), lambda: _tessellate(shape, scale),
+        lambda mesh: mesh.vertices.nbytes + mesh.faces.nbytes)
+    return mesh.copy()
 
-def generate_3d_text(input_data: Generate3DInput) -> tuple[BytesIO, str, Generate3DResult]:
-    text_compound, border_compound, dimensions = _build_geometry(input_data)
 
+def _border_and_bbox(input_data: Generate3DInput, text_compound, cutter_compound,
+                     outline_compound):
+    border_compound = _border_stage(input_data, text_compound, cutter_compound, outline_compound)
     if border_compound is not None:
         combined = cq.Compound.makeCompound([border_compound, text_compound])
     else:
         combined = text_compound
+    bb = combined.BoundingBox()
+    return border_compound, (bb.xmax - bb.xmin, bb.ymax - bb.ymin, bb.zmax - bb.zmin)
+
 
-    result = _compound_to_workplane(combined)
+def generate_3d_text(input_data: Generate3DInput) -> tuple[BytesIO, str, Generate3DResult]:
+    if _engine(input_data) == "mesh":
+        from src.generator.mesh_engine import generate_3d_text_mesh
+        return generate_3d_text_mesh(input_data)
+
+    glyphs = _new_glyph_instances(input_data)
+    text_mesh, border_mesh, dimensions = _build_meshes(input_data, glyphs)
 
     if input_data.exportFormat == "stl":
-        return _export_stl(result), "model/stl", dimensions
+        return _mesh_to_stl(_combine_meshes(text_mesh, border_mesh)), "model/stl", dimensions
     else:
-        return _export_3mf_multi(
-            text_compound, border_compound,
-            input_data.color, input_data.fillColor,
-            model_name=input_data.text.split("\n")[0][:20],
-        ), "model/3mf", dimensions
+        return _export_3mf_for_input(text_mesh, border_mesh, glyphs, input_data), "model/3mf", dimensions
+
+
+def _buffer(chunks) -> BytesIO:
+    return BytesIO(b"".join(chunks))
 
 
 class Generate3DBothResult:
-    def __init__(self, combined_stl: BytesIO, mf_buf: BytesIO,
-                 dimensions: Generate3DResult,
-                 text_stl: BytesIO, border_stl: BytesIO | None):
-        self.combined_stl = combined_stl
-        self.mf_buf = mf_buf
+    """Tessellated parts of one generation and every artifact derived from them.
+
+    ``iter_3mf`` and ``iter_stl`` serialize an artifact incrementally as byte
+    chunks for streaming; the BytesIO attributes are buffered on first access.
+    """
+
+    def __init__(self, text_mesh, border_mesh, dimensions: Generate3DResult,
+                 input_data: Generate3DInput, glyphs: "GlyphInstances | None" = None):
+        self.text_mesh = text_mesh
+        self.border_mesh = border_mesh
         self.dimensions = dimensions
-        self.text_stl = text_stl
-        self.border_stl = border_stl
+        self.input_data = input_data
+        self.glyphs = glyphs
+
+    def iter_3mf(self):
+        return _iter_3mf_for_input(self.text_mesh, self.border_mesh, self.glyphs, self.input_data)
+
+    def iter_stl(self, part: str = "combined"):
+        """Yield the STL of ``part``: "combined", "text" or "border"."""
+        if part == "text":
+            mesh = self.text_mesh
+        elif part == "border":
+            if self.border_mesh is None:
+                raise ValueError("No border part")
+            mesh = self.border_mesh
+        else:
+            mesh = _combine_meshes(self.text_mesh, self.border_mesh)
+        return _iter_stl(mesh)
+
+    def to_bytes(self) -> bytes:
+        """Serialize the parts and the request, so any process can rebuild artifacts."""
+        import json
+        import numpy as np
+        arrays = {"text_vertices": self.text_mesh.vertices, "text_faces": self.text_mesh.faces}
+        if self.border_mesh is not None:
+            arrays["border_vertices"] = self.border_mesh.vertices
+            arrays["border_faces"] = self.border_mesh.faces
+        meta = {
+            "input": self.input_data.model_dump(mode="json"),
+            "dimensions": self.dimensions.model_dump(mode="json"),
+        }
+        if self.glyphs is not None:
+            # Store glyph bodies tessellated but unscaled; iter_3mf applies the scale.
+            glyphs = self.glyphs.to_meshes()
+            keys = list(glyphs.bodies)
+            for i, key in enumerate(keys):
+                arrays[f"glyph{i}_vertices"] = glyphs.bodies[key].vertices
+                arrays[f"glyph{i}_faces"] = glyphs.bodies[key].faces
+            meta["glyphs"] = {"keys": keys, "placements": glyphs.placements}
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+        buf = BytesIO()
+        np.savez(buf, **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data) -> "Generate3DBothResult":
+        import json
+        import numpy as np
+        import trimesh
+        with np.load(BytesIO(data)) as arrays:
+            meta = json.loads(arrays["meta"].tobytes().decode("utf-8"))
+
+            def mesh(prefix):
+                return trimesh.Trimesh(arrays[f"{prefix}_vertices"], arrays[f"{prefix}_faces"],
+                                       process=False)
+
+            text_mesh = mesh("text")
+            border_mesh = mesh("border") if "border_vertices" in arrays else None
+            glyphs = None
+            if "glyphs" in meta:
+                glyphs = GlyphInstances()
+                for i, key in enumerate(meta["glyphs"]["keys"]):
+                    glyphs.bodies[key] = mesh(f"glyph{i}")
+                glyphs.placements = [(key, tuple(offset))
+                                     for key, offset in meta["glyphs"]["placements"]]
+        return cls(text_mesh, border_mesh, Generate3DResult(**meta["dimensions"]),
+                   Generate3DInput(**meta["input"]), glyphs)
+
+    @staticmethod
+    def read_summary(data) -> tuple[Generate3DResult, bool]:
+        """Return (dimensions, has_border) of serialized geometry without loading meshes."""
+        import json
+        import numpy as np
+        with np.load(BytesIO(data)) as arrays:
+            meta = json.loads(arrays["meta"].tobytes().decode("utf-8"))
+            return Generate3DResult(**meta["dimensions"]), "border_vertices" in arrays
+
+    @cached_property
+    def mf_buf(self) -> BytesIO:
+        return _buffer(self.iter_3mf())
+
+    @cached_property
+    def text_stl(self) -> BytesIO:
+        return _buffer(self.iter_stl("text"))
+
+    @cached_property
+    def border_stl(self) -> BytesIO | None:
+        return _buffer(self.iter_stl("border")) if self.border_mesh is not None else None
 
 
 def generate_3d_both(input_data: Generate3DInput) -> Generate3DBothResult:
-    text_compound, border_compound, dimensions = _build_geometry(input_data)
-
-    if border_compound is not None:
-        combined = cq.Compound.makeCompound([border_compound, text_compound])
+    glyphs = _new_glyph_instances(input_data)
+    if _engine(input_data) == "mesh":
+        from src.generator.mesh_engine import build_mesh_geometry
+        text_mesh, border_mesh, dimensions = build_mesh_geometry(input_data, glyphs)
     else:
-        combined = text_compound
+        # Tessellate each part once; every artifact below is derived from these meshes.
+        text_mesh, border_mesh, dimensions = _build_meshes(input_data, glyphs)
+    return _both_result_from_meshes(text_mesh, border_mesh, dimensions, input_data, glyphs)
+
+
+def _both_result_from_meshes(text_mesh, border_mesh, dimensions: Generate3DResult,
+                             input_data: Generate3DInput,
+                             glyphs: GlyphInstances | None = None) -> Generate3DBothResult:
+    return Generate3DBothResult(text_mesh, border_mesh, dimensions, input_data, glyphs)
 
-    combined_stl = _export_stl(_compound_to_workplane(combined))
-    text_stl = _export_stl(_compound_to_workplane(text_compound))
-    border_stl = _export_stl(_compound_to_workplane(border_compound)) if border_compound else None
 
-    mf_buf = _export_3mf_multi(
-        text_compound, border_compound,
-        input_data.color, input_data.fillColor,
+def _new_glyph_instances(input_data: Generate3DInput) -> GlyphInstances | None:
+    return GlyphInstances() if input_data.instanceGlyphs else None
+
+
+def _export_3mf_for_input(text_mesh, border_mesh, glyphs: GlyphInstances | None,
+                          input_data: Generate3DInput) -> BytesIO:
+    return _buffer(_iter_3mf_for_input(text_mesh, border_mesh, glyphs, input_data))
+
+
+def _iter_3mf_for_input(text_mesh, border_mesh, glyphs: GlyphInstances | None,
+                        input_data: Generate3DInput):
+    # The meshes are shared by every caller of a result and must not be modified
+    # here. Colours are not written per face: parts pick theirs from the extruder
+    # assigned in model_settings.config.
+    if glyphs is not None and glyphs.placements:
+        glyphs = glyphs.to_meshes(input_data.scale)
+    else:
+        glyphs = None
+    return _iter_3mf_meshes(
+        text_mesh, border_mesh,
         model_name=input_data.text.split("\n")[0][:20],
+        glyphs=glyphs,
     )
-    return Generate3DBothResult(combined_stl, mf_buf, dimensions, text_stl, border_stl)
 
 
-def _export_stl(result) -> BytesIO:
-    with tempfile.NamedTemporaryFile(suffix=".stl", delete=False) as tmp:
-        tmp_path = tmp.name
-    try:
-        cq.exporters.export(result, tmp_path, exportType="STL")
-        buf = BytesIO()
-        with open(tmp_path, "rb") as f:
-            buf.write(f.read())
-        buf.seek(0)
-        return buf
-    finally:
-        os.unlink(tmp_path)
+# Same deflection settings cq.exporters uses for STL export.
+STL_TOLERANCE = 0.1
+STL_ANGULAR_TOLERANCE = 0.1
+# Decimal places (mm) at which coincident tessellation nodes are welded.
+TESSELLATION_MERGE_DIGITS = 6
 
 
-def _hex_to_rgba(color: str):
-    import numpy as np
-    r = int(color[1:3], 16)
-    g = int(color[3:5], 16)
-    b = int(color[5:7], 16)
-    return np.array([r, g, b, 255], dtype=np.uint8)
+def _mesh_in_place(shape) -> None:
+    """Store a BRepMesh triangulation on the faces of ``shape``."""
+    from OCP.BRepMesh import BRepMesh_IncrementalMesh
+    BRepMesh_IncrementalMesh(shape.wrapped, STL_TOLERANCE, True, STL_ANGULAR_TOLERANCE, True)
+
 
+def _tessellate(shape, scale: float = 1.0):
+    """Mesh ``shape`` once with BRepMesh and return it as an indexed trimesh.
 
-def _stl_buf_to_mesh(stl_buf: BytesIO, color: str):
+    ``scale`` is applied uniformly about the origin to the resulting vertices.
+    """
+    import numpy as np
     import trimesh
-    stl_buf.seek(0)
-    mesh = trimesh.load(stl_buf, file_type="stl")
-    rgba = _hex_to_rgba(color)
-    if isinstance(mesh, trimesh.Scene):
-        for geom in mesh.geometry.values():
-            geom.visual.face_colors = rgba
-    else:
-        mesh.visual.face_colors = rgba
+    from OCP.BRep import BRep_Tool
+    from OCP.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+    from OCP.TopExp import TopExp_Explorer
+    from OCP.TopLoc import TopLoc_Location
+    from OCP.TopoDS import TopoDS
+
+    t0 = time.time()
+    _mesh_in_place(shape)
+
+    vertices = []
+    faces = []
+    offset = 0
+    explorer = TopExp_Explorer(shape.wrapped, TopAbs_FACE)
+    while explorer.More():
+        face = TopoDS.Face_s(explorer.Current())
+        explorer.Next()
+        loc = TopLoc_Location()
+        tri = BRep_Tool.Triangulation_s(face, loc)
+        if tri is None:
+            continue
+        nodes = np.array([tri.Node(i).Coord() for i in range(1, tri.NbNodes() + 1)])
+        if not loc.IsIdentity():
+            trsf = loc.Transformation()
+            m = np.array([[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)])
+            nodes = nodes @ m[:, :3].T + m[:, 3]
+        tris = np.array([tri.Triangle(i).Get() for i in range(1, tri.NbTriangles() + 1)],
+                        dtype=np.int64) - 1
+        if face.Orientation() == TopAbs_REVERSED:
+            tris = tris[:, ::-1]
+        vertices.append(nodes)
+        faces.append(tris + offset)
+        offset += len(nodes)
+
+    if not faces:
+        return trimesh.Trimesh()
+    mesh = trimesh.Trimesh(np.vstack(vertices) * scale, np.vstack(faces))
+    # Faces sharing an edge evaluate its nodes separately, so the copies can differ
+    # by more than trimesh's exact merge; weld them so booleans see a closed volume.
+    mesh.merge_vertices(digits_vertex=TESSELLATION_MERGE_DIGITS)
+    logger.debug("_tessellate: %d verts, %d faces, %.0fms",
+                 len(mesh.vertices), len(mesh.faces), (time.time()-t0)*1000)
     return mesh
 
 
-def _mesh_to_object_model(mesh, obj_id, uuid_str):
+def _combine_meshes(text_mesh, border_mesh):
+    import trimesh
+    if border_mesh is None:
+        return text_mesh
+    return trimesh.util.concatenate([border_mesh, text_mesh])
+
+
+_STL_HEADER = b"Binary STL written by emoji-maker".ljust(80, b" ")
+
+
+# Triangles (STL) or XML rows (3MF) serialized per chunk when streaming.
+STREAM_CHUNK_ROWS = 4096
+
+
+def _iter_stl(mesh, chunk_faces: int = STREAM_CHUNK_ROWS):
+    """Yield ``mesh`` as binary STL, ``chunk_faces`` triangles per chunk."""
+    import numpy as np
+    record = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+    faces = mesh.faces
+    normals = mesh.face_normals
+    yield _STL_HEADER + np.uint32(len(faces)).tobytes()
+    for start in range(0, len(faces), chunk_faces):
+        stop = start + chunk_faces
+        records = np.zeros(len(faces[start:stop]), dtype=record)
+        records["normal"] = normals[start:stop]
+        records["vertices"] = mesh.vertices[faces[start:stop]]
+        yield records.tobytes()
+
+
+def _mesh_to_stl(mesh) -> BytesIO:
+    """Serialize ``mesh`` as binary STL entirely in memory."""
+    return _buffer(_iter_stl(mesh))
+
+
+# Decimal places written for 3MF vertex coordinates (millimetres).
+MF_COORD_PRECISION = int(os.environ.get("MF_COORD_PRECISION", "5"))
+
+
+def _format_rows(template: str, rows) -> str:
+    """Format every row of a 2D array with ``template`` in one C-level % operation."""
+    if len(rows) == 0:
+        return ""
+    return (template * len(rows)) % tuple(rows.ravel().tolist())
+
+
+def _mesh_geometry(mesh):
     import trimesh
     if isinstance(mesh, trimesh.Scene):
-        geom = list(mesh.geometry.values())[0]
-    else:
-        geom = mesh
-    verts = geom.vertices
-    faces = geom.faces
+        return list(mesh.geometry.values())[0]
+    return mesh
+
 
-    lines = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
+def _iter_mesh_object_xml(mesh, obj_id, uuid_str, precision: int = MF_COORD_PRECISION,
+                          chunk_rows: int = STREAM_CHUNK_ROWS):
+    geom = _mesh_geometry(mesh)
+    num = f"%.{precision}f"
+    vertex_row = f'     <vertex x="{num}" y="{num}" z="{num}"/>\n'
+    triangle_row = '     <triangle v1="%d" v2="%d" v3="%d"/>\n'
+    yield (
+        f'  <object id="{obj_id}" p:UUID="{uuid_str}" type="model">\n'
+        '   <mesh>\n'
+        '    <vertices>\n'
+    )
+    for start in range(0, len(geom.vertices), chunk_rows):
+        yield _format_rows(vertex_row, geom.vertices[start:start + chunk_rows])
+    yield '    </vertices>\n    <triangles>\n'
+    for start in range(0, len(geom.faces), chunk_rows):
+        yield _format_rows(triangle_row, geom.faces[start:start + chunk_rows])
+    yield (
+        '    </triangles>\n'
+        '   </mesh>\n'
+        '  </object>\n'
+    )
+
+
+def _iter_objects_model(objects, precision: int = MF_COORD_PRECISION, placements=()):
+    """Yield [(mesh, obj_id, uuid)] as one 3MF object file, in chunks.
+
+    ``placements`` are [(obj_id, uuid, mesh_obj_id)]: objects that consist of a
+    single untransformed component referencing one of the mesh objects.
+    """
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
         '<model unit="millimeter" xml:lang="en-US"'
         ' xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02"'
         ' xmlns:BambuStudio="http://schemas.bambulab.com/package/2021"'
         ' xmlns:p="http://schemas.microsoft.com/3dmanufacturing/production/2015/06"'
-        ' requiredextensions="p">',
-        ' <metadata name="BambuStudio:3mfVersion">1</metadata>',
-        ' <resources>',
-        f'  <object id="{obj_id}" p:UUID="{uuid_str}" type="model">',
-        '   <mesh>',
-        '    <vertices>',
-    ]
-    for v in verts:
-        lines.append(f'     <vertex x="{v[0]}" y="{v[1]}" z="{v[2]}"/>')
-    lines.append('    </vertices>')
-    lines.append('    <triangles>')
-    for f in faces:
-        lines.append(f'     <triangle v1="{f[0]}" v2="{f[1]}" v3="{f[2]}"/>')
-    lines.append('    </triangles>')
-    lines.append('   </mesh>')
-    lines.append('  </object>')
-    lines.append(' </resources>')
-    lines.append('</model>')
-    return '\n'.join(lines)
+        ' requiredextensions="p">\n'
+        ' <metadata name="BambuStudio:3mfVersion">1</metadata>\n'
+        ' <resources>\n'
+    )
+    for mesh, obj_id, uuid_str in objects:
+        yield from _iter_mesh_object_xml(mesh, obj_id, uuid_str, precision)
+    for obj_id, uuid_str, mesh_id in placements:
+        yield (
+            f'  <object id="{obj_id}" p:UUID="{uuid_str}" type="model">\n'
+            '   <components>\n'
+            f'    <component objectid="{mesh_id}"/>\n'
+            '   </components>\n'
+            '  </object>\n'
+        )
+    yield ' </resources>\n</model>'
+
+
+def _objects_to_model(objects, precision: int = MF_COORD_PRECISION) -> str:
+    """Serialize [(mesh, obj_id, uuid)] as one 3MF object file."""
+    return ''.join(_iter_objects_model(objects, precision))
+
+
+def _mesh_to_object_model(mesh, obj_id, uuid_str, precision: int = MF_COORD_PRECISION):
+    return _objects_to_model([(mesh, obj_id, uuid_str)], precision)
 
 
 def _get_plate_for_object(wrap_id, object_files, has_border):
@@ -577,52 +1049,84 @@ def _get_plate_for_object(wrap_id, object_files, has_border):
     return 3
 
 
-def _export_3mf_multi(text_compound, border_compound,
-                       text_color: str, fill_color: str,
-                       model_name: str = "model") -> BytesIO:
-    import trimesh
-    import zipfile
+def _iter_3mf_meshes(text_mesh, border_mesh, model_name: str = "model",
+                     precision: int = MF_COORD_PRECISION,
+                     glyphs: GlyphInstances | None = None):
+    """Return the Bambu Studio 3MF package as an iterator of byte chunks.
+
+    When ``glyphs`` (already tessellated, see GlyphInstances.to_meshes) is given,
+    the text part is stored as one object per distinct glyph and each occurrence
+    becomes a translated component instead of serializing ``text_mesh``.
+    """
     import re
     import uuid as uuid_mod
 
     safe_name = re.sub(r'[^\w\s-]', '', model_name).strip().replace(' ', '_') or "model"
+    has_border = border_mesh is not None
 
-    text_stl = _export_stl(_compound_to_workplane(text_compound))
-    text_mesh = _stl_buf_to_mesh(text_stl, text_color)
-
-    has_border = border_compound is not None
-    if has_border:
-        border_stl = _export_stl(_compound_to_workplane(border_compound))
-        border_mesh = _stl_buf_to_mesh(border_stl, fill_color)
-
-    # Each mesh gets a separate object file in 3D/Objects/
+    # Each distinct mesh is written once as an object file in 3D/Objects/ and
+    # referenced by components (3MF production extension) from every plate using it.
     # Bambu pattern: part ids are odd (1,3,5,...), wrapper object ids are even (2,4,6,...)
     # For 3 plates with border: combined(text+fill), text-only, fill-only
     # Without border: single plate with text
 
-    object_files = []  # (filename, part_id, wrapper_id, part_uuid, wrapper_uuid, mesh, name, extruder)
-
+    mesh_files = []  # (filename, [(mesh, object_id, object_uuid), ...], placements)
+    object_files = []  # (filename, parts, wrapper_id, wrapper_uuid, name, extruder)
+    # parts: [(object_id, (dx, dy, dz), face_count), ...], one component each
+    ids = itertools.count(1, 2)
+
+    if glyphs is not None:
+        glyph_ids = {key: next(ids) for key in glyphs.bodies}
+        text_objects = [(mesh, glyph_ids[key], str(uuid_mod.uuid4()))
+                        for key, mesh in glyphs.bodies.items()]
+        text_uses = [(glyph_ids[key], offset, len(glyphs.bodies[key].faces))
+                     for key, offset in glyphs.placements]
+    else:
+        text_objects = [(text_mesh, next(ids), str(uuid_mod.uuid4()))]
+        text_uses = [(1, (0.0, 0.0, 0.0), len(_mesh_geometry(text_mesh).faces))]
     if has_border:
-        # Object 1: text for combined plate
-        object_files.append(("object_1.model", 1, 2,
-                             str(uuid_mod.uuid4()), str(uuid_mod.uuid4()),
-                             text_mesh, f"{safe_name} - Text", "1"))
-        # Object 2: fill for combined plate
-        object_files.append(("object_2.model", 3, 4,
-                             str(uuid_mod.uuid4()), str(uuid_mod.uuid4()),
-                             border_mesh, f"{safe_name} - Fill", "2"))
-        # Object 3: text-only plate
-        object_files.append(("object_3.model", 5, 6,
-                             str(uuid_mod.uuid4()), str(uuid_mod.uuid4()),
-                             text_mesh, f"{safe_name} - Text Only", "1"))
-        # Object 4: fill-only plate
-        object_files.append(("object_4.model", 7, 8,
-                             str(uuid_mod.uuid4()), str(uuid_mod.uuid4()),
-                             border_mesh, f"{safe_name} - Fill Only", "2"))
+        border_objects = [(border_mesh, next(ids), str(uuid_mod.uuid4()))]
+        border_uses = [(border_objects[0][1], (0.0, 0.0, 0.0),
+                        len(_mesh_geometry(border_mesh).faces))]
+
+    # Bambu Studio keys part settings on the component's object id across the whole
+    # package, so a mesh object is a part only where it is first used. Every other
+    # use (a repeated glyph, the Text Only and Fill Only plates) gets an object of
+    # its own that references the shared mesh: [(object_id, object_uuid, mesh_id)].
+    used = set()
+
+    def _parts(uses, placements):
+        parts = []
+        for mesh_id, offset, face_count in uses:
+            part_id = mesh_id
+            if mesh_id in used:
+                part_id = next(ids)
+                placements.append((part_id, str(uuid_mod.uuid4()), mesh_id))
+            used.add(mesh_id)
+            parts.append((part_id, offset, face_count))
+        return parts
+
+    text_placements = []
+    border_placements = []
+    mesh_files.append(("object_1.model", text_objects, text_placements))
+    if has_border:
+        mesh_files.append(("object_2.model", border_objects, border_placements))
+        # Combined plate: text + fill
+        object_files.append(("object_1.model", _parts(text_uses, text_placements), 2,
+                             str(uuid_mod.uuid4()), f"{safe_name} - Text", "1"))
+        object_files.append(("object_2.model", _parts(border_uses, border_placements), 4,
+                             str(uuid_mod.uuid4()), f"{safe_name} - Fill", "2"))
+        # Text-only and fill-only plates reuse the same mesh resources
+        object_files.append(("object_1.model", _parts(text_uses, text_placements), 6,
+                             str(uuid_mod.uuid4()), f"{safe_name} - Text Only", "1"))
+        object_files.append(("object_2.model", _parts(border_uses, border_placements), 8,
+                             str(uuid_mod.uuid4()), f"{safe_name} - Fill Only", "2"))
     else:
-        object_files.append(("object_1.model", 1, 2,
-                             str(uuid_mod.uuid4()), str(uuid_mod.uuid4()),
-                             text_mesh, safe_name, "1"))
+        object_files.append(("object_1.model", _parts(text_uses, text_placements), 2,
+                             str(uuid_mod.uuid4()), safe_name, "1"))
+
+    def _offset(v):
+        return repr(round(v, precision))
 
     # Build main model with component references
     # Positions match Bambu Studio's plate layout in the overview
@@ -635,12 +1139,17 @@ def _export_3mf_multi(text_compound, border_compound,
     resource_lines = []
     build_lines = []
     build_transforms = {}
-    for (fname, part_id, wrap_id, part_uuid, wrap_uuid, mesh, name, extruder) in object_files:
+    for (fname, parts, wrap_id, wrap_uuid, name, extruder) in object_files:
+        components = ''.join(
+            f'    <component p:path="/3D/Objects/{fname}" objectid="{part_id}"'
+            f' p:UUID="{uuid_mod.uuid4()}"'
+            f' transform="1 0 0 0 1 0 0 0 1 {_offset(dx)} {_offset(dy)} {_offset(dz)}"/>\n'
+            for part_id, (dx, dy, dz), _ in parts
+        )
         resource_lines.append(
             f'  <object id="{wrap_id}" p:UUID="{wrap_uuid}" type="model">\n'
             f'   <components>\n'
-            f'    <component p:path="/3D/Objects/{fname}" objectid="{part_id}"'
-            f' p:UUID="{part_uuid}" transform="1 0 0 0 1 0 0 0 1 0 0 0"/>\n'
+            + components +
             f'   </components>\n'
             f'  </object>'
         )
@@ -684,7 +1193,7 @@ def _export_3mf_multi(text_compound, border_compound,
 
     # Relationships for object files
     rel_lines = []
-    for i, (fname, *_) in enumerate(object_files, 1):
+    for i, (fname, *_) in enumerate(mesh_files, 1):
         rel_lines.append(
             f' <Relationship Target="/3D/Objects/{fname}" Id="rel-{i}"'
             f' Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
@@ -698,20 +1207,26 @@ def _export_3mf_multi(text_compound, border_compound,
 
     # model_settings.config with object metadata and plate assignments
     config_objects = []
-    for (fname, part_id, wrap_id, part_uuid, wrap_uuid, mesh, name, extruder) in object_files:
-        geom = mesh if not isinstance(mesh, trimesh.Scene) else list(mesh.geometry.values())[0]
-        face_count = len(geom.faces)
+    for (fname, parts, wrap_id, wrap_uuid, name, extruder) in object_files:
+        face_count = sum(count for _, _, count in parts)
+        part_lines = []
+        for i, (part_id, (dx, dy, dz), part_faces) in enumerate(parts, 1):
+            part_name = name if len(parts) == 1 else f"{name} {i}"
+            part_lines.append(
+                f'    <part id="{part_id}" subtype="normal_part">\n'
+                f'      <metadata key="name" value="{part_name}"/>\n'
+                f'      <metadata key="matrix" value="1 0 0 {_offset(dx)} 0 1 0 {_offset(dy)}'
+                f' 0 0 1 {_offset(dz)} 0 0 0 1"/>\n'
+                f'      <mesh_stat face_count="{part_faces}" edges_fixed="0"'
+                f' degenerate_facets="0" facets_removed="0" facets_reversed="0" backwards_edges="0"/>\n'
+                f'    </part>\n'
+            )
         config_objects.append(
             f'  <object id="{wrap_id}">\n'
             f'    <metadata key="name" value="{name}"/>\n'
             f'    <metadata key="extruder" value="{extruder}"/>\n'
             f'    <metadata face_count="{face_count}"/>\n'
-            f'    <part id="{part_id}" subtype="normal_part">\n'
-            f'      <metadata key="name" value="{name}"/>\n'
-            f'      <metadata key="matrix" value="1 0 0 0 0 1 0 0 0 0 1 0 0 0 0 1"/>\n'
-            f'      <mesh_stat face_count="{face_count}" edges_fixed="0"'
-            f' degenerate_facets="0" facets_removed="0" facets_reversed="0" backwards_edges="0"/>\n'
-            f'    </part>\n'
+            + ''.join(part_lines) +
             f'  </object>'
         )
 
@@ -782,7 +1297,7 @@ def _export_3mf_multi(text_compound, border_compound,
         )
 
     assemble_items = []
-    for (fname, part_id, wrap_id, part_uuid, wrap_uuid, mesh, name, extruder) in object_files:
+    for (fname, parts, wrap_id, wrap_uuid, name, extruder) in object_files:
         tx, ty, tz = build_transforms[wrap_id]
         assemble_items.append(
             f'   <assemble_item object_id="{wrap_id}" instance_id="0"'
@@ -800,61 +1315,10 @@ def _export_3mf_multi(text_compound, border_compound,
         '</config>'
     )
 
-    content_types = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">\n'
-        ' <Default Extension="rels" ContentType='
-        '"application/vnd.openxmlformats-package.relationships+xml"/>\n'
-        ' <Default Extension="model" ContentType='
-        '"application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>\n'
-        '</Types>'
-    )
-
-    root_rels = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">\n'
-        ' <Relationship Target="/3D/3dmodel.model" Id="rel-1"'
-        ' Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>\n'
-        '</Relationships>'
-    )
-
-    slice_info = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<config>\n'
-        '  <header>\n'
-        '    <header_item key="X-BBL-Client-Type" value="slicer"/>\n'
-        '    <header_item key="X-BBL-Client-Version" value="02.05.00.66"/>\n'
-        '  </header>\n'
-        '</config>'
-    )
-
-    num_plates = 3 if has_border else 1
-    plate_seqs = ", ".join(
-        f'"plate_{i}": {{"sequence": []}}' for i in range(1, num_plates + 1)
-    )
-    filament_seq = "{" + plate_seqs + "}"
-
-    project_settings_path = os.path.join(
-        os.path.dirname(__file__), 'bambu_project_settings.json'
+    from src.generator.mf_package import TEMPLATE
+    return TEMPLATE.iter_build(
+        main_model, model_rels,
+        [(fname, _iter_objects_model(objects, precision, placements))
+         for fname, objects, placements in mesh_files],
+        config_xml, num_plates=3 if has_border else 1,
     )
-    project_settings = ""
-    if os.path.exists(project_settings_path):
-        with open(project_settings_path, 'r') as f:
-            project_settings = f.read()
-
-    buf = BytesIO()
-    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr('[Content_Types].xml', content_types)
-        zf.writestr('_rels/.rels', root_rels)
-        zf.writestr('3D/3dmodel.model', main_model)
-        zf.writestr('3D/_rels/3dmodel.model.rels', model_rels)
-        for (fname, part_id, wrap_id, part_uuid, wrap_uuid, mesh, name, extruder) in object_files:
-            obj_xml = _mesh_to_object_model(mesh, part_id, part_uuid)
-            zf.writestr(f'3D/Objects/{fname}', obj_xml)
-        zf.writestr('Metadata/model_settings.config', config_xml)
-        zf.writestr('Metadata/slice_info.config', slice_info)
-        zf.writestr('Metadata/filament_sequence.json', filament_seq)
-        if project_settings:
-            zf.writestr('Metadata/project_settings.config', project_settings)
-    buf.seek(0)
-    return buf
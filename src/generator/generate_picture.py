@@ -1,10 +1,13 @@
 import math
 import os
+from functools import lru_cache
 from io import BytesIO
+from typing import Literal
 
 from PIL import Image, ImageDraw, ImageFont
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from src.generator.cache import LRUCache
 from src.generator.hdr import convert_to_hdr
 
 # Wolt fonts
@@ -27,9 +30,108 @@ FONTS_WOLT = [
 
 FONT_SIZE_INITIAL = 160
 
+# Font files used by the platforms generate_image and make_gif render.
+PLATFORM_FONTS = [FONT_WOLT_COND_BLACK, FONT_DOORDASH_BOLD, FONT_DELIVEROO_SEMIBOLD]
+
+# Loaded FreeTypeFont objects keyed by (font path, size). Pillow holds the GIL
+# while it calls into FreeType, so a font can be shared between threads.
+_font_pool = LRUCache(
+    max_entries=int(os.environ.get("FONT_POOL_MAX_ENTRIES", "512")),
+    name="font_pool",
+)
+
 
 def fonts_with_size(font_path: str, font_size: int):
-    return ImageFont.truetype(font_path, size=font_size)
+    return _font_pool.get_or_create(
+        (font_path, font_size), lambda: ImageFont.truetype(font_path, size=font_size))
+
+
+def font_pool_stats() -> dict:
+    return _font_pool.stats()
+
+
+def _first_probes(levels: int, max_size: int = FONT_SIZE_INITIAL) -> list[int]:
+    """Sizes fit_text tries in the first ``levels`` steps of its search, for any text.
+
+    Every fit_text call probes the first size, half of them the next one either
+    way, and so on, so these are the sizes requests hit most.
+    """
+    sizes = range(max_size, 1, -2)
+    probes = []
+    bounds = [(0, len(sizes))]
+    for _ in range(levels):
+        narrowed = []
+        for lo, hi in bounds:
+            if lo < hi:
+                mid = (lo + hi) // 2
+                probes.append(sizes[mid])
+                narrowed += [(lo, mid), (mid + 1, hi)]
+        bounds = narrowed
+    return probes
+
+
+def preload_fonts() -> None:
+    """Load the platform fonts at the sizes fit_text tries first (see _first_probes).
+
+    FONT_POOL_PRELOAD sets how many search steps to cover (default 3, i.e. 7 sizes
+    per font); 0 loads fonts on first use only. Other sizes are pooled as they
+    are used.
+    """
+    levels = int(os.environ.get("FONT_POOL_PRELOAD", "3"))
+    for font_path in PLATFORM_FONTS:
+        for font_size in _first_probes(levels):
+            fonts_with_size(font_path, font_size)
+
+
+# textbbox of a text at a font size, keyed by (font path, size, text). Typewriter
+# GIFs and repeated emojis measure the same strings over and over.
+_text_bbox_cache = LRUCache(
+    max_entries=int(os.environ.get("TEXT_BBOX_CACHE_MAX_ENTRIES", "16384")),
+    name="text_bbox",
+)
+
+
+def text_bbox_cache_stats() -> dict:
+    return _text_bbox_cache.stats()
+
+
+def _text_bbox(font_path: str, font_size: int, text: str):
+    def measure():
+        img_draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        return img_draw.textbbox((0, 0), text, fonts_with_size(font_path, font_size))
+    return _text_bbox_cache.get_or_create((font_path, font_size, text), measure)
+
+
+def fit_text(font_path: str, text: str, margin: int,
+             max_size: int = FONT_SIZE_INITIAL) -> tuple[int, float, float]:
+    """Return (font_size, x_start, y_start) placing ``text`` centred on the canvas.
+
+    The size is the largest of max_size, max_size - 2, ... that fits with the
+    margin, found by binary search since the text box grows with the size. If
+    none fits, the size is what the old step-down loop ended on and the text
+    sits at the origin.
+    """
+    sizes = range(max_size, 1, -2)
+
+    def fits(size):
+        bbox = _text_bbox(font_path, size, text)
+        return bbox[-2] + margin <= image_width and bbox[-1] + margin <= image_height
+
+    lo, hi = 0, len(sizes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(sizes[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    if lo == len(sizes):
+        return max_size - 2 * len(sizes), 0, 0
+
+    font_size = sizes[lo]
+    bbox = _text_bbox(font_path, font_size, text)
+    text_width = bbox[-2]
+    text_height = bbox[-1]
+    return font_size, (image_width - text_width) / 2, (image_height - text_height) / 2
 
 
 image_width = 256
@@ -53,41 +155,69 @@ class GenerateInput(BaseModel):
     frameDelay: int = 200
     hdr: bool = False
     platform: str = "wolt"  # "wolt" or "deliveroo"
+    # Container of the animation when gif=True.
+    format: Literal["gif", "webp", "apng"] = "gif"
+    # "delta": one shared palette, each frame only its own rectangle (not with hdr).
+    # "full": Pillow quantizes every full frame.
+    gifEncoding: Literal["delta", "full"] = "delta"
+    # WebP: lossy quality, or lossless; method trades encode time for size.
+    webpQuality: int = Field(default=80, ge=0, le=100)
+    webpMethod: int = Field(default=4, ge=0, le=6)
+    webpLossless: bool = False
+    # APNG: zlib level, 0 (fastest) to 9 (smallest).
+    apngCompressLevel: int = Field(default=6, ge=0, le=9)
 
 
-def generate_image(input: GenerateInput):
-    text = input.text.upper()
+# Media type of each animation format.
+ANIMATION_MEDIA_TYPES = {"gif": "image/gif", "webp": "image/webp", "apng": "image/apng"}
+
+# Encoder settings that only apply to one animation format.
+_FORMAT_FIELDS = {
+    "gif": ("gifEncoding",),
+    "webp": ("webpQuality", "webpMethod", "webpLossless"),
+    "apng": ("apngCompressLevel",),
+}
+
 
-    # Select font and color based on platform
-    if input.platform == "deliveroo":
-        font_path = FONT_DELIVEROO_SEMIBOLD
-        color = COLOR_RGB_DELIVEROO
-    elif input.platform == "doordash":
-        font_path = FONT_DOORDASH_BOLD
-        color = COLOR_RGB_DOORDASH
+def image_key(input: GenerateInput) -> str:
+    """Content hash of a request; equal for requests that render the same image."""
+    import hashlib
+    import json
+    fields = input.model_dump(mode="json")
+    fields["text"] = input.text.upper()
+    if fields["platform"] not in ("deliveroo", "doordash"):
+        fields["platform"] = "wolt"
+    for animation_format, names in _FORMAT_FIELDS.items():
+        if not input.gif or animation_format != input.format:
+            for name in names:
+                del fields[name]
+    if not input.gif:
+        # Animation settings do not affect a still image.
+        del fields["loop"], fields["frameDelay"], fields["format"]
+    elif input.format == "gif" and input.hdr:
+        del fields["gifEncoding"]
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+def platform_style(platform: str) -> tuple[str, tuple[int, int, int]]:
+    """Return the (font path, text colour) of a platform."""
+    if platform == "deliveroo":
+        return FONT_DELIVEROO_SEMIBOLD, COLOR_RGB_DELIVEROO
+    elif platform == "doordash":
+        return FONT_DOORDASH_BOLD, COLOR_RGB_DOORDASH
     else:  # Default to wolt
-        font_path = FONT_WOLT_COND_BLACK
-        color = COLOR_RGB_WOLT
+        return FONT_WOLT_COND_BLACK, COLOR_RGB_WOLT
+
+
+def generate_image(input: GenerateInput):
+    text = input.text.upper()
+    font_path, color = platform_style(input.platform)
 
     img = Image.new("RGBA", (image_width, image_height), (255, 255, 255, 0))
+    imgDraw = ImageDraw.Draw(img)
 
-    font_size = FONT_SIZE_INITIAL
-    x_start = 0
-    y_start = 0
-    while font_size > 1:
-        imgDraw = ImageDraw.Draw(img)
-        font = fonts_with_size(font_path, font_size)
-        bbox = imgDraw.textbbox((0, 0), text, font)
-        text_width = bbox[-2]
-        text_height = bbox[-1]
-        if (
-            text_width + input.margin <= image_width
-            and text_height + input.margin <= image_height
-        ):
-            x_start = (image_width - text_width) / 2
-            y_start = (image_height - text_height) / 2
-            break
-        font_size -= 2
+    font_size, x_start, y_start = fit_text(font_path, text, input.margin)
 
     font = fonts_with_size(font_path, font_size)
     imgDraw.text(
@@ -106,47 +236,28 @@ def generate_image(input: GenerateInput):
         return image_buffer
 
 
-def make_gif(input: GenerateInput):
-    text = input.text.upper()
+def typewriter_frames(input: GenerateInput):
+    """Yield the frames of the typewriter animation: "", then each prefix of the text.
 
-    # Select font and color based on platform
-    if input.platform == "deliveroo":
-        font_path = FONT_DELIVEROO_SEMIBOLD
-        color = COLOR_RGB_DELIVEROO
-    elif input.platform == "doordash":
-        font_path = FONT_DOORDASH_BOLD
-        color = COLOR_RGB_DOORDASH
-    else:  # Default to wolt
-        font_path = FONT_WOLT_COND_BLACK
-        color = COLOR_RGB_WOLT
+    Every prefix is centred on its own, so a frame cannot be drawn on top of the
+    previous one; each is a fresh canvas. Frames are produced one at a time for
+    the encoder to consume.
+    """
+    text = input.text.upper()
+    font_path, color = platform_style(input.platform)
 
     font_size = FONT_SIZE_INITIAL
-    frames = []
     for i in range(len(text) + 1):
         partial_text = text[:i]
+        # The size only ever shrinks as the prefix grows.
+        font_size, x_start, y_start = fit_text(
+            font_path, partial_text, input.margin, max_size=font_size)
+
         img = Image.new("RGBA", (image_width, image_height), (255, 255, 255, 0))
-        x_start = 0
-        y_start = 0
-        while font_size > 1:
-            imgDraw = ImageDraw.Draw(img)
-            font = fonts_with_size(font_path, font_size)
-            bbox = imgDraw.textbbox((0, 0), partial_text, font)
-            text_width = bbox[-2]
-            text_height = bbox[-1]
-            if (
-                text_width + input.margin <= image_width
-                and text_height + input.margin <= image_height
-            ):
-                x_start = (image_width - text_width) / 2
-                y_start = (image_height - text_height) / 2
-                break
-            font_size -= 2
-
-        font = fonts_with_size(font_path, font_size)
-        imgDraw.text(
+        ImageDraw.Draw(img).text(
             (x_start, y_start),
             partial_text,
-            font=font,
+            font=fonts_with_size(font_path, font_size),
             fill=color,
             align="center",
         )
@@ -154,20 +265,112 @@ def make_gif(input: GenerateInput):
         if input.hdr:
             # Convert frame to HDR and back to PIL Image for GIF
             hdr_buffer = convert_to_hdr(img)
-            hdr_frame = Image.open(hdr_buffer)
-            frames.append(hdr_frame.copy())
+            yield Image.open(hdr_buffer).copy()
         else:
-            frames.append(img.copy())
+            yield img
+
+
+@lru_cache(maxsize=16)
+def _alpha_palette(color: tuple[int, int, int]) -> list[int]:
+    """Palette whose entry ``a`` is ``color`` drawn with coverage ``a`` on the blank canvas.
+
+    Text is drawn in a single colour, so the alpha of a frame pixel identifies
+    its colour and the alpha channel can be used as the palette index directly.
+    The entries are taken from Pillow itself by pasting the colour through a
+    0..255 mask, which is what ImageDraw.text does with the glyph mask.
+    """
+    ramp = Image.new("RGBA", (256, 1), (255, 255, 255, 0))
+    ramp.paste(color, mask=Image.frombytes("L", (256, 1), bytes(range(256))))
+    return [c for r, g, b, _ in ramp.getdata() for c in (r, g, b)]
+
+
+def _delta_gif_frames(frames, color):
+    """Turn RGBA typewriter frames into P frames on the shared alpha palette."""
+    palette = _alpha_palette(color)
+    for frame in frames:
+        indexed = Image.frombytes("P", frame.size, frame.getchannel("A").tobytes())
+        indexed.putpalette(palette)
+        yield indexed
+
+
+def make_gif(input: GenerateInput):
+    frames = typewriter_frames(input)
+    options = {}
+    if input.gifEncoding == "delta" and not input.hdr:
+        # Index 0 (no coverage) is transparent. With disposal=2 every frame is
+        # cleared before the next, so Pillow writes each one as the rectangle
+        # around its own text; the text is re-centred on every frame, so that
+        # is all that changes. Frames already share the palette: no optimize.
+        _, color = platform_style(input.platform)
+        frames = _delta_gif_frames(frames, color)
+        options = {"transparency": 0, "optimize": False}
+    first = next(frames)
 
     image_buffer = BytesIO()
-    frames[0].save(
+    first.save(
         image_buffer,
         format="GIF",
-        append_images=frames[1:],
+        append_images=frames,
         save_all=True,
         duration=input.frameDelay,
         loop=0 if input.loop else 1,
         interlace=False,
         disposal=2,
+        **options,
     )
     return image_buffer
+
+
+def make_webp(input: GenerateInput):
+    """Encode the typewriter animation as an animated WebP with full alpha."""
+    frames = typewriter_frames(input)
+    first = next(frames)
+
+    image_buffer = BytesIO()
+    first.save(
+        image_buffer,
+        format="WEBP",
+        append_images=frames,
+        save_all=True,
+        duration=input.frameDelay,
+        loop=0 if input.loop else 1,
+        quality=input.webpQuality,
+        method=input.webpMethod,
+        lossless=input.webpLossless,
+    )
+    return image_buffer
+
+
+def make_apng(input: GenerateInput):
+    """Encode the typewriter animation as an APNG with full alpha.
+
+    Like the GIF, every frame clears to transparent before the next, so Pillow
+    stores each one as the rectangle around its own text.
+    """
+    from PIL.PngImagePlugin import Blend, Disposal
+
+    frames = typewriter_frames(input)
+    first = next(frames)
+
+    image_buffer = BytesIO()
+    first.save(
+        image_buffer,
+        format="PNG",
+        append_images=frames,
+        save_all=True,
+        duration=input.frameDelay,
+        loop=0 if input.loop else 1,
+        disposal=Disposal.OP_BACKGROUND,
+        blend=Blend.OP_SOURCE,
+        compress_level=input.apngCompressLevel,
+    )
+    return image_buffer
+
+
+def make_animation(input: GenerateInput):
+    """Encode the typewriter animation in ``input.format``."""
+    if input.format == "webp":
+        return make_webp(input)
+    elif input.format == "apng":
+        return make_apng(input)
+    return make_gif(input)
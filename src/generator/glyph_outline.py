@@ -0,0 +1,161 @@
+"""Glyph outlines read straight from the font file as Shapely polygons.
+
+Outlines are placed exactly where cq.Compound.makeText puts the glyph: OCCT
+centres each glyph horizontally on its advance width and vertically on the
+font's ascender/descender, in units where the em square equals the font size.
+"""
+import logging
+import math
+import os
+import threading
+from functools import lru_cache
+
+from fontTools.pens.basePen import BasePen
+from fontTools.ttLib import TTFont
+from shapely import affinity
+from shapely.geometry import Polygon
+from shapely.geometry.polygon import orient
+
+from src.generator.cache import LRUCache
+
+logger = logging.getLogger("gen3d.outline")
+
+# Maximum distance between a curve and its flattened polyline, as a fraction of the em.
+OUTLINE_TOLERANCE = float(os.environ.get("GLYPH_OUTLINE_TOLERANCE", "0.0005"))
+
+_outline_cache = LRUCache(
+    max_entries=int(os.environ.get("GLYPH_OUTLINE_CACHE_MAX_ENTRIES", "4096")),
+    name="glyph_outline",
+)
+# fontTools decompiles glyphs lazily and is not safe to share across threads.
+_font_lock = threading.Lock()
+
+
+class _FlatteningPen(BasePen):
+    """Collects glyph contours as point lists, flattening curves within ``tolerance``."""
+
+    def __init__(self, glyph_set, tolerance: float):
+        super().__init__(glyph_set)
+        self.tolerance = tolerance
+        self.contours: list[list[tuple[float, float]]] = []
+        self._current: list[tuple[float, float]] = []
+
+    def _moveTo(self, pt):
+        self._current = [pt]
+
+    def _lineTo(self, pt):
+        self._current.append(pt)
+
+    def _qCurveToOne(self, pt1, pt2):
+        (x0, y0), (x1, y1), (x2, y2) = self._getCurrentPoint(), pt1, pt2
+        # Wang's formula for the number of segments needed to stay within tolerance.
+        dd = math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2)
+        n = max(1, math.ceil(math.sqrt(0.25 * dd / self.tolerance)))
+        for i in range(1, n + 1):
+            t = i / n
+            mt = 1 - t
+            self._current.append((
+                mt * mt * x0 + 2 * mt * t * x1 + t * t * x2,
+                mt * mt * y0 + 2 * mt * t * y1 + t * t * y2,
+            ))
+
+    def _curveToOne(self, pt1, pt2, pt3):
+        (x0, y0), (x1, y1), (x2, y2), (x3, y3) = self._getCurrentPoint(), pt1, pt2, pt3
+        dd = max(math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2),
+                 math.hypot(x1 - 2 * x2 + x3, y1 - 2 * y2 + y3))
+        n = max(1, math.ceil(math.sqrt(0.75 * dd / self.tolerance)))
+        for i in range(1, n + 1):
+            t = i / n
+            mt = 1 - t
+            a, b, c, d = mt * mt * mt, 3 * mt * mt * t, 3 * mt * t * t, t * t * t
+            self._current.append((
+                a * x0 + b * x1 + c * x2 + d * x3,
+                a * y0 + b * y1 + c * y2 + d * y3,
+            ))
+
+    def _closePath(self):
+        if len(self._current) >= 3:
+            self.contours.append(self._current)
+        self._current = []
+
+    _endPath = _closePath
+
+
+@lru_cache(maxsize=None)
+def _load_font(font_path: str) -> TTFont:
+    return TTFont(font_path)
+
+
+def _contours_to_polygon(contours):
+    """Combine contours with the nonzero fill rule into one (Multi)Polygon.
+
+    Contours are applied largest first: those wound like the largest contour add
+    area, the others cut holes, so islands inside holes are restored afterwards.
+    """
+    rings = [Polygon(c) for c in contours]
+    rings = [r if r.is_valid else r.buffer(0) for r in rings]
+    rings = [r for r in rings if not r.is_empty and r.area > 0]
+    if not rings:
+        return None
+    signed = sorted(
+        ((Polygon(c).exterior.is_ccw, r) for c, r in zip(contours, rings)),
+        key=lambda item: item[1].area, reverse=True,
+    )
+    fill_ccw = signed[0][0]
+    result = signed[0][1]
+    for ccw, ring in signed[1:]:
+        result = result.union(ring) if ccw == fill_ccw else result.difference(ring)
+    if result.is_empty:
+        return None
+    if result.geom_type == "Polygon":
+        return orient(result)
+    return result
+
+
+def _unit_polygon(font_path: str, char: str, tolerance: float):
+    font = _load_font(font_path)
+    glyph_name = font.getBestCmap().get(ord(char))
+    if glyph_name is None:
+        return None
+    glyph_set = font.getGlyphSet()
+    upm = font["head"].unitsPerEm
+    pen = _FlatteningPen(glyph_set, tolerance * upm)
+    glyph = glyph_set[glyph_name]
+    glyph.draw(pen)
+    poly = _contours_to_polygon(pen.contours)
+    if poly is None:
+        return None
+
+    hhea = font["hhea"]
+    dx = -glyph.width / 2
+    dy = -(hhea.ascent + hhea.descent) / 2
+    poly = affinity.translate(poly, xoff=dx, yoff=dy)
+    return affinity.scale(poly, xfact=1 / upm, yfact=1 / upm, origin=(0, 0))
+
+
+def glyph_polygon(font_path: str, char: str, font_size: float,
+                  tolerance: float = OUTLINE_TOLERANCE):
+    """Return the glyph outline at ``font_size`` in makeText coordinates, or None."""
+    key = (font_path, char, tolerance)
+    def build():
+        with _font_lock:
+            return _unit_polygon(font_path, char, tolerance)
+
+    poly = _outline_cache.get_or_create(key, build)
+    if poly is None:
+        return None
+    return affinity.scale(poly, xfact=font_size, yfact=font_size, origin=(0, 0))
+
+
+def glyph_advance(font_path: str, char: str, font_size: float) -> float:
+    """Return the horizontal advance of ``char`` at ``font_size`` (0 if missing)."""
+    with _font_lock:
+        font = _load_font(font_path)
+        glyph_name = font.getBestCmap().get(ord(char))
+        if glyph_name is None:
+            return 0.0
+        return font["hmtx"][glyph_name][0] * font_size / font["head"].unitsPerEm
+
+
+def outline_cache_stats() -> dict:
+    return _outline_cache.stats()
@@ -0,0 +1,95 @@
+"""On-disk store of precompiled glyph faces shared by all worker processes.
+
+Glyphs are written as binary BREP files under a directory named after the font
+file and its content hash, so editing or replacing a font invalidates its glyphs
+automatically. The store is filled at image build time (scripts/build_glyph_store.py)
+or lazily on first use; writes are atomic renames, so concurrent workers never
+see a partial file. Set GLYPH_STORE_DIR to an empty string to disable it.
+"""
+import hashlib
+import logging
+import os
+import string
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+import cadquery as cq
+
+logger = logging.getLogger("gen3d.store")
+
+GLYPH_STORE_DIR = os.environ.get(
+    "GLYPH_STORE_DIR", str(Path(__file__).parent / "glyph_store"))
+
+# Characters precompiled at build time; anything else is added lazily.
+PRECOMPILED_CHARS = string.ascii_letters + string.digits + string.punctuation + "ÄÖÜäöüÅåß€"
+
+
+@lru_cache(maxsize=None)
+def font_version(font_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(font_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _glyph_path(font_path: str, char: str, unit_size: float) -> Path:
+    font_dir = f"{Path(font_path).stem}-{font_version(font_path)}"
+    return Path(GLYPH_STORE_DIR) / font_dir / f"{ord(char):05x}-{unit_size:g}.brep"
+
+
+def load_glyph(font_path: str, char: str, unit_size: float):
+    if not GLYPH_STORE_DIR:
+        return None
+    path = _glyph_path(font_path, char, unit_size)
+    try:
+        with open(path, "rb") as f:
+            shape = cq.Shape.importBin(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("load_glyph: cannot read %s: %s", path, e)
+        return None
+    if shape.wrapped.IsNull():
+        logger.warning("load_glyph: %s is empty, ignoring", path)
+        return None
+    return shape
+
+
+def save_glyph(font_path: str, char: str, unit_size: float, shape) -> None:
+    if not GLYPH_STORE_DIR:
+        return
+    path = _glyph_path(font_path, char, unit_size)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    except OSError as e:
+        # A read-only image without a prebuilt store still works, just colder.
+        logger.debug("save_glyph: cannot write %s: %s", path, e)
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shape.exportBin(f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        # Never leave a partial file behind in the shared store.
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        logger.warning("save_glyph: cannot write %s: %s", path, e)
+
+
+def build_store(font_paths: list[str], chars: str, unit_size: float) -> int:
+    count = 0
+    for font_path in font_paths:
+        for char in chars:
+            if load_glyph(font_path, char, unit_size) is not None:
+                continue
+            shape = cq.Compound.makeText(char, unit_size, 0, fontPath=font_path)
+            if shape.wrapped.IsNull() or not shape.Faces():
+                continue
+            save_glyph(font_path, char, unit_size, shape)
+            count += 1
+    return count
@@ -0,0 +1,220 @@
+"""Pure-mesh geometry engine that builds name tags without OCCT.
+
+Mirrors _build_geometry in generate_3d_text step by step, but works on the 2D
+glyph polygons from glyph_outline: parts are extruded with trimesh and cut with
+manifold3d booleans, so no BRep is built or tessellated. Lines rendered with
+letterSpacing == 0 are laid out on glyph advances without kerning, which is what
+OCCT's text builder does for the bundled CFF fonts.
+"""
+import logging
+import time
+
+import numpy as np
+import trimesh
+from shapely import affinity
+from shapely.geometry import Polygon, box
+
+from src.generator.font_manager import get_font_path
+from src.generator.glyph_outline import glyph_advance, glyph_polygon
+
+logger = logging.getLogger("gen3d.mesh")
+
+FILL_INSET = 0.2
+KEYCHAIN_HOLE_SECTIONS = 64
+
+
+def _extrude(poly, height: float, z0: float = 0.0) -> trimesh.Trimesh:
+    parts = poly.geoms if poly.geom_type == "MultiPolygon" else [poly]
+    meshes = [trimesh.creation.extrude_polygon(p, height) for p in parts]
+    mesh = meshes[0] if len(meshes) == 1 else trimesh.util.concatenate(meshes)
+    if z0:
+        mesh.apply_translation((0, 0, z0))
+    return mesh
+
+
+def _layout_line(text: str, font_size: float, font_path: str,
+                 letter_spacing: float, placements: list | None = None) -> tuple[list, float]:
+    """Return the glyph polygons of one line, positioned from x=0, and the line width.
+
+    Characters the font has no glyph for are skipped, as the OCCT engine does.
+    When ``placements`` is given, (char, x offset of glyph_polygon) is appended for
+    every returned polygon.
+    """
+    if not text.strip():
+        return [], 0.0
+
+    polys = []
+    offsets = []
+    if letter_spacing == 0:
+        # Same as Workplane.text on the whole line: glyphs advance-spaced, then the
+        # line is shifted so its ink starts at x=0.
+        pen = 0.0
+        for char in text:
+            poly = glyph_polygon(font_path, char, font_size) if char != " " else None
+            advance = glyph_advance(font_path, char, font_size)
+            if poly is not None:
+                # glyph_polygon is centred on the advance; move it to the pen position.
+                polys.append(affinity.translate(poly, xoff=pen + advance / 2))
+                offsets.append((char, pen + advance / 2))
+            pen += advance
+        if not polys:
+            return [], 0.0
+        minx = min(p.bounds[0] for p in polys)
+        maxx = max(p.bounds[2] for p in polys)
+        if placements is not None:
+            placements.extend((char, dx - minx) for char, dx in offsets)
+        return [affinity.translate(p, xoff=-minx) for p in polys], maxx - minx
+
+    x = 0.0
+    for char in text:
+        if char == " ":
+            x += font_size * 0.3 + letter_spacing
+            continue
+        poly = glyph_polygon(font_path, char, font_size)
+        if poly is None:
+            continue
+        minx, _, maxx, _ = poly.bounds
+        polys.append(affinity.translate(poly, xoff=x - minx))
+        if placements is not None:
+            placements.append((char, x - minx))
+        x += (maxx - minx) + letter_spacing
+    return polys, x
+
+
+def _gap_cutters(text_meshes: list, gap_percent: float) -> list:
+    scale_factor = 1 + gap_percent / 100.0
+    cutters = []
+    for mesh in text_meshes:
+        center = mesh.bounds.mean(axis=0)
+        matrix = trimesh.transformations.scale_matrix(scale_factor, center)
+        cutters.append(mesh.copy().apply_transform(matrix))
+    return cutters
+
+
+def _difference(mesh: trimesh.Trimesh, cutters: list) -> trimesh.Trimesh:
+    if not cutters:
+        return mesh
+    return trimesh.boolean.difference([mesh, *cutters], engine="manifold")
+
+
+def build_mesh_geometry(input_data, glyphs=None):
+    """Build (text_mesh, border_mesh | None, dimensions) like _build_geometry.
+
+    ``glyphs`` (a GlyphInstances) receives one unplaced body per distinct character
+    and the offset of every occurrence.
+    """
+    from src.generator.generate_3d_text import Generate3DResult, _fill_holes
+
+    t_start = time.time()
+    font_path = get_font_path(input_data.font)
+    if not font_path:
+        raise ValueError(f"Unknown font: {input_data.font}")
+
+    height = input_data.extrudeHeight
+    lines = input_data.text.split("\n")
+    line_placements = [[] if glyphs is not None else None for _ in lines]
+    line_results = [
+        _layout_line(line, input_data.fontSize, font_path, input_data.letterSpacing, placements)
+        for line, placements in zip(lines, line_placements)
+    ]
+    max_width = max((w for _, w in line_results), default=0)
+    if max_width == 0:
+        raise ValueError("No visible characters in text")
+
+    line_height = input_data.fontSize + input_data.lineSpacing
+    char_polys = []
+    for line_idx, (polys, width) in enumerate(line_results):
+        x_offset = (max_width - width) / 2
+        y_offset = -line_idx * line_height
+        char_polys.extend(affinity.translate(p, xoff=x_offset, yoff=y_offset) for p in polys)
+        if glyphs is not None:
+            for char, dx in line_placements[line_idx]:
+                if char not in glyphs.bodies:
+                    glyphs.bodies[char] = _extrude(
+                        glyph_polygon(font_path, char, input_data.fontSize), height)
+                glyphs.add(char, glyphs.bodies[char], (dx + x_offset, y_offset, 0.0))
+
+    text_meshes = [_extrude(p, height) for p in char_polys]
+    text_mesh = trimesh.util.concatenate(text_meshes)
+    logger.debug("build_mesh_geometry: %d glyph meshes, max_width=%.2f", len(text_meshes), max_width)
+
+    cutters = _gap_cutters(text_meshes, input_data.gap) if input_data.gap > 0 else text_meshes
+
+    outline_mesh = None
+    if input_data.addOutline:
+        from shapely.ops import unary_union
+        outline = unary_union([_fill_holes(p) for p in char_polys]).buffer(
+            input_data.outlineWidth, resolution=16, join_style=1)
+        if not outline.is_empty:
+            outline_mesh = _difference(_extrude(outline, height), cutters)
+            if len(outline_mesh.vertices) == 0:
+                logger.warning("build_mesh_geometry: outline boolean produced empty mesh")
+                outline_mesh = None
+
+    border_mesh = None
+    if input_data.addBorder:
+        bounds = text_mesh.bounds
+        if outline_mesh is not None:
+            bounds = np.vstack([bounds, outline_mesh.bounds])
+        xmin, ymin = bounds[:, 0].min(), bounds[:, 1].min()
+        xmax, ymax = bounds[:, 0].max(), bounds[:, 1].max()
+        pt = input_data.borderPaddingTop
+        pr = input_data.borderPaddingRight
+        pb = input_data.borderPaddingBottom
+        pl = input_data.borderPaddingLeft
+        outer = box(xmin - pl, ymin - pb, xmax + pr, ymax + pt)
+
+        if input_data.fillBorder:
+            plate = _extrude(outer, height - 2 * FILL_INSET, z0=FILL_INSET)
+            plate_cutters = list(cutters)
+            if input_data.keychainHole:
+                r = input_data.keychainRadius
+                eh = input_data.keychainEdgeH
+                ev = input_data.keychainEdgeV
+                fxmin, fymin, fxmax, fymax = outer.bounds
+                corner = input_data.keychainCorner
+                hole_x = fxmin + eh + r if corner.endswith("left") else fxmax - eh - r
+                hole_y = fymin + ev + r if corner.startswith("bottom") else fymax - ev - r
+                hole = trimesh.creation.cylinder(
+                    radius=r, height=height, sections=KEYCHAIN_HOLE_SECTIONS)
+                hole.apply_translation((hole_x, hole_y, height / 2))
+                plate_cutters.append(hole)
+            border_mesh = _difference(plate, plate_cutters)
+        else:
+            wall = input_data.fontSize * 0.08
+            inner = box(xmin - pl + wall, ymin - pb + wall, xmax + pr - wall, ymax + pt - wall)
+            border_mesh = _extrude(Polygon(outer.exterior, [inner.exterior]), height)
+
+    if outline_mesh is not None:
+        if border_mesh is not None:
+            border_mesh = trimesh.util.concatenate([border_mesh, outline_mesh])
+        else:
+            border_mesh = outline_mesh
+
+    if input_data.scale != 1.0:
+        text_mesh.apply_scale(input_data.scale)
+        if border_mesh is not None:
+            border_mesh.apply_scale(input_data.scale)
+
+    parts = [text_mesh] if border_mesh is None else [border_mesh, text_mesh]
+    bounds = np.vstack([m.bounds for m in parts])
+    size = bounds.max(axis=0) - bounds.min(axis=0)
+    dimensions = Generate3DResult(
+        width=round(float(size[0]), 2),
+        height=round(float(size[1]), 2),
+        depth=round(float(size[2]), 2),
+    )
+    logger.info("build_mesh_geometry: %.1fx%.1fx%.1fmm, total %.0fms",
+                dimensions.width, dimensions.height, dimensions.depth, (time.time()-t_start)*1000)
+    return text_mesh, border_mesh, dimensions
+
+
+def generate_3d_text_mesh(input_data):
+    from src.generator.generate_3d_text import (
+        _combine_meshes, _export_3mf_for_input, _mesh_to_stl, _new_glyph_instances)
+
+    glyphs = _new_glyph_instances(input_data)
+    text_mesh, border_mesh, dimensions = build_mesh_geometry(input_data, glyphs)
+    if input_data.exportFormat == "stl":
+        return _mesh_to_stl(_combine_meshes(text_mesh, border_mesh)), "model/stl", dimensions
+    return _export_3mf_for_input(text_mesh, border_mesh, glyphs, input_data), "model/3mf", dimensions
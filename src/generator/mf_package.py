@@ -0,0 +1,236 @@
+"""Minimal streaming zip writer for 3MF packages with pre-compressed static members.
+
+zipfile.ZipFile always compresses what it is given, so members that never change
+between requests ([Content_Types].xml, the relationship parts, slice_info and the
+large project settings blob) would be re-DEFLATEd on every export. Here they are
+compressed once at import into ready-to-copy entries; only the per-request model
+and config members are compressed when a package is written.
+
+Packages are produced as an iterator of byte chunks. Per-request members are
+compressed as their content is generated and written with a trailing data
+descriptor, so a mesh object never has to exist as one string or buffer.
+"""
+import os
+import struct
+import time
+import zlib
+
+# zlib level for the 3D/Objects/*.model mesh members, which dominate export time.
+MESH_COMPRESS_LEVEL = int(os.environ.get("MF_MESH_COMPRESS_LEVEL", "6"))
+# Level for everything else, matching zipfile's default.
+DEFAULT_COMPRESS_LEVEL = 6
+
+# Approximate size of the chunks yielded by iter_zip.
+CHUNK_SIZE = 64 * 1024
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_DATA_DESCRIPTOR = struct.Struct("<IIII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_VERSION = 20
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_DEFLATED = 8
+
+
+class ZipEntry:
+    """A compressed zip member: name, CRC, sizes and raw DEFLATE data."""
+
+    __slots__ = ("name", "crc", "size", "data", "dos_time", "dos_date")
+
+    def __init__(self, name: str, crc: int, size: int, data: bytes,
+                 dos_time: int, dos_date: int):
+        self.name = name
+        self.crc = crc
+        self.size = size
+        self.data = data
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+
+
+def _dos_datetime(timestamp: float) -> tuple[int, int]:
+    t = time.localtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class StreamEntry:
+    """A zip member compressed while ``chunks`` (str or bytes) is consumed."""
+
+    __slots__ = ("name", "chunks", "level")
+
+    def __init__(self, name: str, chunks, level: int = DEFAULT_COMPRESS_LEVEL):
+        self.name = name
+        self.chunks = chunks
+        self.level = level
+
+
+def compress_entry(name: str, content: str | bytes,
+                   level: int = DEFAULT_COMPRESS_LEVEL) -> ZipEntry:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(content) + compressor.flush()
+    return ZipEntry(name, zlib.crc32(content), len(content), data,
+                    *_dos_datetime(time.time()))
+
+
+def _central_record(name: bytes, flags: int, dos_time: int, dos_date: int, crc: int,
+                    compressed: int, size: int, offset: int) -> bytes:
+    return _CENTRAL_HEADER.pack(
+        0x02014B50, _VERSION, _VERSION, flags, _DEFLATED, dos_time, dos_date,
+        crc, compressed, size, len(name), 0, 0, 0, 0, 0, offset) + name
+
+
+def iter_zip(entries):
+    """Yield a zip archive of ``entries`` (ZipEntry or StreamEntry) in chunks."""
+    central = []
+    pending = bytearray()
+    offset = 0
+    for entry in entries:
+        name = entry.name.encode("utf-8")
+        entry_offset = offset + len(pending)
+        if isinstance(entry, ZipEntry):
+            pending += _LOCAL_HEADER.pack(
+                0x04034B50, _VERSION, _FLAG_UTF8, _DEFLATED, entry.dos_time, entry.dos_date,
+                entry.crc, len(entry.data), entry.size, len(name), 0)
+            pending += name
+            pending += entry.data
+            central.append(_central_record(
+                name, _FLAG_UTF8, entry.dos_time, entry.dos_date, entry.crc,
+                len(entry.data), entry.size, entry_offset))
+        else:
+            flags = _FLAG_UTF8 | _FLAG_DATA_DESCRIPTOR
+            dos_time, dos_date = _dos_datetime(time.time())
+            pending += _LOCAL_HEADER.pack(
+                0x04034B50, _VERSION, flags, _DEFLATED, dos_time, dos_date,
+                0, 0, 0, len(name), 0)
+            pending += name
+            compressor = zlib.compressobj(entry.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            crc = size = compressed = 0
+            for chunk in entry.chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                data = compressor.compress(chunk)
+                compressed += len(data)
+                pending += data
+                if len(pending) >= CHUNK_SIZE:
+                    offset += len(pending)
+                    yield bytes(pending)
+                    pending.clear()
+            data = compressor.flush()
+            compressed += len(data)
+            pending += data
+            pending += _DATA_DESCRIPTOR.pack(0x08074B50, crc, compressed, size)
+            central.append(_central_record(
+                name, flags, dos_time, dos_date, crc, compressed, size, entry_offset))
+        if len(pending) >= CHUNK_SIZE:
+            offset += len(pending)
+            yield bytes(pending)
+            pending.clear()
+
+    directory_offset = offset + len(pending)
+    for record in central:
+        pending += record
+    pending += _END_RECORD.pack(
+        0x06054B50, 0, 0, len(central), len(central),
+        offset + len(pending) - directory_offset, directory_offset, 0)
+    yield bytes(pending)
+
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">\n'
+    ' <Default Extension="rels" ContentType='
+    '"application/vnd.openxmlformats-package.relationships+xml"/>\n'
+    ' <Default Extension="model" ContentType='
+    '"application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>\n'
+    '</Types>'
+)
+
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">\n'
+    ' <Relationship Target="/3D/3dmodel.model" Id="rel-1"'
+    ' Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>\n'
+    '</Relationships>'
+)
+
+SLICE_INFO = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<config>\n'
+    '  <header>\n'
+    '    <header_item key="X-BBL-Client-Type" value="slicer"/>\n'
+    '    <header_item key="X-BBL-Client-Version" value="02.05.00.66"/>\n'
+    '  </header>\n'
+    '</config>'
+)
+
+
+def _filament_sequence(num_plates: int) -> str:
+    plate_seqs = ", ".join(
+        f'"plate_{i}": {{"sequence": []}}' for i in range(1, num_plates + 1)
+    )
+    return "{" + plate_seqs + "}"
+
+
+def _load_project_settings() -> str:
+    path = os.path.join(os.path.dirname(__file__), 'bambu_project_settings.json')
+    if not os.path.exists(path):
+        return ""
+    with open(path, 'r') as f:
+        return f.read()
+
+
+class PackageTemplate:
+    """Static 3MF members, compressed once and copied into every package."""
+
+    def __init__(self, project_settings: str):
+        self.head = [
+            compress_entry('[Content_Types].xml', CONTENT_TYPES),
+            compress_entry('_rels/.rels', ROOT_RELS),
+        ]
+        self.slice_info = compress_entry('Metadata/slice_info.config', SLICE_INFO)
+        # The filament sequence only depends on the plate count (1 or 3).
+        self.filament_sequences = {
+            n: compress_entry('Metadata/filament_sequence.json', _filament_sequence(n))
+            for n in (1, 3)
+        }
+        self.project_settings = (
+            compress_entry('Metadata/project_settings.config', project_settings)
+            if project_settings else None
+        )
+
+    def filament_sequence(self, num_plates: int) -> ZipEntry:
+        entry = self.filament_sequences.get(num_plates)
+        if entry is None:
+            entry = compress_entry('Metadata/filament_sequence.json',
+                                   _filament_sequence(num_plates))
+        return entry
+
+    def iter_build(self, main_model: str, model_rels: str, objects: list[tuple[str, object]],
+                   model_settings: str, num_plates: int,
+                   mesh_level: int = MESH_COMPRESS_LEVEL):
+        """Yield a package in chunks.
+
+        ``objects`` is [(path under 3D/Objects/, xml)], where xml is a string or an
+        iterable of string chunks that is consumed while the package is written.
+        """
+        entries = list(self.head)
+        entries.append(StreamEntry('3D/3dmodel.model', (main_model,)))
+        entries.append(StreamEntry('3D/_rels/3dmodel.model.rels', (model_rels,)))
+        for fname, xml in objects:
+            chunks = (xml,) if isinstance(xml, str) else xml
+            entries.append(StreamEntry(f'3D/Objects/{fname}', chunks, mesh_level))
+        entries.append(StreamEntry('Metadata/model_settings.config', (model_settings,)))
+        entries.append(self.slice_info)
+        entries.append(self.filament_sequence(num_plates))
+        if self.project_settings is not None:
+            entries.append(self.project_settings)
+        return iter_zip(entries)
+
+
+TEMPLATE = PackageTemplate(_load_project_settings())
@@ -0,0 +1,67 @@
+"""Job functions executed in worker processes (see worker_pool).
+
+Jobs take picklable request models and return plain bytes, so results cross the
+process boundary without pickling BRep shapes or trimesh objects.
+"""
+
+
+def warmup_2d() -> None:
+    """Import the image generator and load its fonts before a 2D worker takes its first job."""
+    from src.generator.generate_picture import preload_fonts
+    preload_fonts()
+
+
+def warmup_3d() -> None:
+    """Import the 3D generator (OCCT, trimesh) before a 3D worker takes its first job."""
+    import src.generator.generate_3d_text  # noqa: F401
+
+
+def generate_image(data) -> bytes:
+    from src.generator.generate_picture import generate_image
+    return generate_image(data).getvalue()
+
+
+def make_animation(data) -> bytes:
+    from src.generator.generate_picture import make_animation
+    return make_animation(data).getvalue()
+
+
+def picture_cache_stats() -> dict:
+    """Font pool and text box cache counters of a 2D worker (see WorkerPool.worker_stats)."""
+    from src.generator.generate_picture import font_pool_stats, text_bbox_cache_stats
+    return {"font_pool": font_pool_stats(), "text_bbox_cache": text_bbox_cache_stats()}
+
+
+def model_cache_stats() -> dict:
+    """Glyph, outline and stage cache counters of a 3D worker (see WorkerPool.worker_stats)."""
+    from src.generator.generate_3d_text import glyph_cache_stats, stage_cache_stats
+    from src.generator.glyph_outline import outline_cache_stats
+    return {"glyph_cache": glyph_cache_stats(), "outline_cache": outline_cache_stats(),
+            "stage_cache": stage_cache_stats()}
+
+
+def generate_3d(data) -> bytes:
+    """Build the 3D geometry and return it serialized (Generate3DBothResult.to_bytes)."""
+    from src.generator.generate_3d_text import generate_3d_both
+    return generate_3d_both(data).to_bytes()
+
+
+# Artifacts materialize_3d can build from stored geometry, by file-name suffix.
+MODEL_ARTIFACTS = {
+    "3mf": lambda result: result.iter_3mf(),
+    "stl": lambda result: result.iter_stl(),
+    "text.stl": lambda result: result.iter_stl("text"),
+    "border.stl": lambda result: result.iter_stl("border"),
+}
+
+
+def materialize_3d(geometry: bytes, kind: str) -> bytes | None:
+    """Serialize artifact ``kind`` (see MODEL_ARTIFACTS) of generate_3d's geometry.
+
+    Returns None for a border STL of a model without a border.
+    """
+    from src.generator.generate_3d_text import Generate3DBothResult
+    result = Generate3DBothResult.from_bytes(geometry)
+    if kind == "border.stl" and result.border_mesh is None:
+        return None
+    return b"".join(MODEL_ARTIFACTS[kind](result))
@@ -6,13 +6,20 @@ import contextvars
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
-from src.generator.generate_picture import (GenerateInput, generate_image,
-                                            make_gif)
-from src.generator.generate_3d_text import Generate3DInput, generate_3d_text, generate_3d_both
+from src.generator.generate_picture import ANIMATION_MEDIA_TYPES, GenerateInput, image_key
+from src.generator.generate_3d_text import (Generate3DInput, Generate3DBothResult,
+                                            generation_key)
 from src.generator.font_manager import get_available_fonts
+from src.generator.cache import merge_stats
+from src.artifact_store import create_store
+from src.single_flight import SingleFlight
+from src.worker_pool import JobTimeout, PoolFull, SharedBuffer, WorkerCrashed, create_pool
+from src import jobs
 
 trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar('trace_id', default='-')
 
@@ -52,7 +59,104 @@ app.add_middleware(
 api_app = FastAPI()
 app.mount("/api", api_app)
 
-_temp_files: dict[str, bytes] = {}
+# Separate lanes keep 2D emoji latency independent of 3D load: each has its own
+# workers and queue, and 3D workers run at a lower CPU priority.
+_pool_2d = create_pool("2d", initializer=jobs.warmup_2d, size=2, max_queue=32,
+                       job_timeout=15, max_jobs=1000, worker_stats=jobs.picture_cache_stats)
+_pool_3d = create_pool("3d", initializer=jobs.warmup_3d, max_queue=16,
+                       job_timeout=60, max_jobs=200, priority=10,
+                       worker_stats=jobs.model_cache_stats)
+
+
+# Identical requests that arrive while one is being generated share its result.
+_image_flights = SingleFlight("generate")
+_model_flights = SingleFlight("generate-3d")
+_artifact_flights = SingleFlight("materialize-3d")
+
+
+@app.on_event("startup")
+def start_pool():
+    _pool_2d.start()
+    _pool_3d.start()
+
+
+@app.on_event("shutdown")
+def stop_pool():
+    _pool_2d.shutdown()
+    _pool_3d.shutdown()
+    # Unlinks shared memory segments still held by in-memory artifacts.
+    _artifacts.close()
+
+
+def _pool_error_response(e: Exception) -> JSONResponse | None:
+    """Map worker pool failures to HTTP responses; None for job errors."""
+    if isinstance(e, PoolFull):
+        return JSONResponse(status_code=503, content={"error": "Server busy, please retry"},
+                            headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, JobTimeout):
+        return JSONResponse(status_code=504, content={"error": "Generation timed out"})
+    if isinstance(e, WorkerCrashed):
+        return JSONResponse(status_code=500, content={"error": "Generation failed"})
+    return None
+
+
+def _unwrap(result):
+    """Split a pool result into (bytes-like, release callback or None).
+
+    Large results arrive as a SharedBuffer in the worker's shared memory; they are
+    used in place and ``release`` must be called once nothing serves them anymore.
+    """
+    if isinstance(result, SharedBuffer):
+        return result.view(), result.release
+    return result, None
+
+_artifacts = create_store()
+
+
+def _store_temp_file(key: str, data: bytes, release=None):
+    try:
+        _artifacts.put(key, data, release=release)
+    except Exception:
+        logger.exception("storing artifact %s failed", key)
+
+
+async def _get_artifact(file_id: str, kind: str, geometry=None):
+    """Return a stored artifact, building it from the generation's geometry on first use."""
+    key = f"{file_id}.{kind}"
+    data = await run_in_threadpool(_artifacts.get, key)
+    if data is not None:
+        return data
+    if kind not in jobs.MODEL_ARTIFACTS:
+        return None
+    if geometry is None:
+        geometry = await run_in_threadpool(_artifacts.get, f"{file_id}.geometry")
+        if geometry is None:
+            return None
+    data, _ = await _artifact_flights.run(key, _materialize, key, geometry, kind)
+    return data
+
+
+async def _materialize(key: str, geometry, kind: str):
+    # Serializing meshes is CPU-bound like the generation itself, so it runs on the
+    # 3D lane; the stored geometry is copied to bytes off the loop to cross the pipe.
+    if not isinstance(geometry, bytes):
+        geometry = await run_in_threadpool(bytes, geometry)
+    t0 = time.time()
+    data, release = _unwrap(await _pool_3d.run(jobs.materialize_3d, geometry, kind))
+    if data is None:
+        return None
+    logger.info("materialized %s (%d bytes) in %.0fms", key, len(data), (time.time() - t0) * 1000)
+    # The store owns the shared buffer from here; views already handed out stay valid.
+    await run_in_threadpool(_store_temp_file, key, data, release)
+    return data
+
+
+def _generation_summary(file_id: str):
+    """Return (dimensions, has_border) of an already generated file id, or None."""
+    geometry = _artifacts.get(f"{file_id}.geometry")
+    if geometry is None:
+        return None
+    return Generate3DBothResult.read_summary(geometry)
 
 # Serve static files
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
@@ -69,13 +173,22 @@ app.mount(
 async def generate(data: GenerateInput):
     if len(data.text) > 30:
         return "Nope"
-    if data.gif:
-        image_buffer = make_gif(data)
-        return Response(content=image_buffer.getvalue(), media_type="image/gif")
-    
-    # Generate PNG (with HDR metadata if hdr=True)
-    image_buffer = generate_image(data)
-    return Response(content=image_buffer.getvalue(), media_type="image/png")
+    try:
+        # GIF/WebP/APNG animation, or PNG (with HDR metadata if hdr=True)
+        if data.gif:
+            job, media_type = jobs.make_animation, ANIMATION_MEDIA_TYPES[data.format]
+        else:
+            job, media_type = jobs.generate_image, "image/png"
+        result, callers = await _image_flights.run(image_key(data), _pool_2d.run, job, data)
+        content, release = _unwrap(result)
+        if callers > 1:
+            # Every caller streams the same shared buffer; it is freed with the last view.
+            release = None
+        return _bytes_response(content, release, media_type=media_type,
+                               headers={"X-Coalesced-Requests": str(callers)})
+    except (PoolFull, JobTimeout, WorkerCrashed) as e:
+        logger.warning("generate failed: %s", e)
+        return _pool_error_response(e)
 
 
 @api_app.get("/fonts")
@@ -84,87 +197,121 @@ async def list_fonts():
     return {"fonts": list(fonts.keys())}
 
 
+@api_app.get("/stats")
+async def stats():
+    # Caches live in the workers that generate; each lane's are summed over its
+    # live workers, as of their last job.
+    return {
+        "model_caches": merge_stats(_pool_3d.worker_stats()),
+        "picture_caches": merge_stats(_pool_2d.worker_stats()),
+        "artifact_store": _artifacts.stats(),
+        "worker_pools": {"2d": _pool_2d.stats(), "3d": _pool_3d.stats()},
+        "single_flight": [_image_flights.stats(), _model_flights.stats(),
+                          _artifact_flights.stats()],
+    }
+
+
 @api_app.post("/generate-3d")
 async def generate_3d(data: Generate3DInput):
     try:
         logger.debug("generate-3d input: text=%r font=%s fontSize=%.1f gap=%.1f outline=%s outlineWidth=%.1f border=%s fill=%s scale=%.1f",
                      data.text, data.font, data.fontSize, data.gap, data.addOutline, data.outlineWidth,
                      data.addBorder, data.fillBorder, data.scale)
-        result = generate_3d_both(data)
-        import re
-        safe_name = re.sub(r'[^\w\s-]', '', data.text.split("\n")[0][:20]).strip().replace(' ', '_')
-
-        file_id = str(uuid.uuid4())
-        _temp_files[f"{file_id}.3mf"] = result.mf_buf.getvalue()
-        _temp_files[f"{file_id}.stl"] = result.combined_stl.getvalue()
-        _temp_files[f"{file_id}.text.stl"] = result.text_stl.getvalue()
-        if result.border_stl:
-            _temp_files[f"{file_id}.border.stl"] = result.border_stl.getvalue()
-
-        while len(_temp_files) > 60:
-            oldest = next(iter(_temp_files))
-            del _temp_files[oldest]
-
-        if data.exportFormat == "3mf":
-            content = _temp_files[f"{file_id}.3mf"]
-            media_type = "model/3mf"
-        else:
-            content = _temp_files[f"{file_id}.stl"]
-            media_type = "model/stl"
-
-        headers = {
-            "Content-Disposition": f'attachment; filename="{safe_name}.{data.exportFormat}"',
-            "X-Model-Width": str(result.dimensions.width),
-            "X-Model-Height": str(result.dimensions.height),
-            "X-Model-Depth": str(result.dimensions.depth),
-            "X-Bambu-File-Id": file_id,
-            "X-Stl-File-Id": file_id,
-            "X-Text-Stl-Id": file_id,
-            "Access-Control-Expose-Headers": "X-Model-Width, X-Model-Height, X-Model-Depth, X-Bambu-File-Id, X-Stl-File-Id, X-Text-Stl-Id, X-Border-Stl-Id",
-        }
-        if result.border_stl:
-            headers["X-Border-Stl-Id"] = file_id
-
-        logger.info("generate-3d ok: %s %.1fx%.1fx%.1fmm",
-                    data.exportFormat, result.dimensions.width, result.dimensions.height, result.dimensions.depth)
-        return Response(content=content, media_type=media_type, headers=headers)
+        # Identical requests share a file id, so a repeat (or the same tag in the
+        # other format) is served from the stored generation.
+        file_id = generation_key(data)
+        media_type = "model/3mf" if data.exportFormat == "3mf" else "model/stl"
+        summary = await run_in_threadpool(_generation_summary, file_id)
+        if summary is not None:
+            content = await _get_artifact(file_id, data.exportFormat)
+            if content is not None:
+                logger.info("generate-3d cache hit: %s %s", file_id, data.exportFormat)
+                return _bytes_response(content, media_type=media_type,
+                                       headers=_model_headers(data, file_id, *summary))
+
+        (summary, geometry), callers = await _model_flights.run(
+            file_id, _generate_geometry, file_id, data)
+        dimensions, has_border = summary
+        headers = _model_headers(data, file_id, dimensions, has_border)
+        headers["X-Coalesced-Requests"] = str(callers)
+        content = await _get_artifact(file_id, data.exportFormat, geometry)
+        logger.info("generate-3d ok: %s %.1fx%.1fx%.1fmm %s", file_id, dimensions.width,
+                    dimensions.height, dimensions.depth, data.exportFormat)
+        return _bytes_response(content, media_type=media_type, headers=headers)
     except Exception as e:
         logger.exception("generate-3d failed")
-        return JSONResponse(status_code=400, content={"error": str(e)})
+        return _pool_error_response(e) or JSONResponse(status_code=400, content={"error": str(e)})
+
+
+async def _generate_geometry(file_id: str, data: Generate3DInput):
+    """Generate on the 3D lane, store the geometry and return ((dimensions, has_border), geometry)."""
+    geometry, release = _unwrap(await _pool_3d.run(jobs.generate_3d, data))
+    try:
+        summary = await run_in_threadpool(Generate3DBothResult.read_summary, geometry)
+    except Exception:
+        if release is not None:
+            release()
+        raise
+    # Artifacts are built from the stored geometry when first fetched. The store
+    # keeps the shared buffer as is and releases it on eviction; views already
+    # handed out stay valid. The directory backend writes a file here, so keep it
+    # off the event loop.
+    await run_in_threadpool(_store_temp_file, f"{file_id}.geometry", geometry, release)
+    return summary, geometry
+
+
+def _model_headers(data: Generate3DInput, file_id: str, dimensions, has_border: bool) -> dict:
+    import re
+    safe_name = re.sub(r'[^\w\s-]', '', data.text.split("\n")[0][:20]).strip().replace(' ', '_')
+    headers = {
+        "Content-Disposition": f'attachment; filename="{safe_name}.{data.exportFormat}"',
+        "X-Model-Width": str(dimensions.width),
+        "X-Model-Height": str(dimensions.height),
+        "X-Model-Depth": str(dimensions.depth),
+        "X-Bambu-File-Id": file_id,
+        "X-Stl-File-Id": file_id,
+        "X-Text-Stl-Id": file_id,
+        "Access-Control-Expose-Headers": "X-Model-Width, X-Model-Height, X-Model-Depth, X-Bambu-File-Id, X-Stl-File-Id, X-Text-Stl-Id, X-Border-Stl-Id",
+    }
+    if has_border:
+        headers["X-Border-Stl-Id"] = file_id
+    return headers
+
+
+def _bytes_response(data, release=None, media_type: str = None, headers: dict = None):
+    headers = dict(headers or {})
+    if isinstance(data, bytes):
+        return Response(content=data, media_type=media_type, headers=headers)
+    # Memory-mapped and shared-memory data is sent in slices instead of being copied whole.
+    headers["Content-Length"] = str(data.nbytes)
+    chunks = (data[i:i + 65536].tobytes() for i in range(0, data.nbytes, 65536))
+    background = BackgroundTask(release) if release is not None else None
+    return StreamingResponse(chunks, media_type=media_type, headers=headers,
+                             background=background)
+
+
+async def _artifact_response(file_id: str, kind: str, media_type: str, filename: str):
+    try:
+        data = await _get_artifact(file_id, kind)
+    except (PoolFull, JobTimeout, WorkerCrashed) as e:
+        logger.warning("materializing %s.%s failed: %s", file_id, kind, e)
+        return _pool_error_response(e)
+    if data is None:
+        return JSONResponse(status_code=404, content={"error": "File not found or expired"})
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return _bytes_response(data, media_type=media_type, headers=headers)
 
 
 @api_app.get("/temp-3mf/{file_id}")
 async def download_temp_3mf(file_id: str):
-    data = _temp_files.get(f"{file_id}.3mf")
-    if not data:
-        return JSONResponse(status_code=404, content={"error": "File not found or expired"})
-    return Response(
-        content=data,
-        media_type="model/3mf",
-        headers={"Content-Disposition": f'attachment; filename="model.3mf"'},
-    )
+    return await _artifact_response(file_id, "3mf", "model/3mf", "model.3mf")
 
 
 @api_app.get("/temp-stl/{file_id}")
 async def download_temp_stl(file_id: str):
-    data = _temp_files.get(f"{file_id}.stl")
-    if not data:
-        return JSONResponse(status_code=404, content={"error": "File not found or expired"})
-    return Response(
-        content=data,
-        media_type="model/stl",
-        headers={"Content-Disposition": f'attachment; filename="model.stl"'},
-    )
+    return await _artifact_response(file_id, "stl", "model/stl", "model.stl")
 
 
 @api_app.get("/temp-stl/{file_id}/{part}")
 async def download_temp_stl_part(file_id: str, part: str):
-    key = f"{file_id}.{part}.stl"
-    data = _temp_files.get(key)
-    if not data:
-        return JSONResponse(status_code=404, content={"error": "File not found or expired"})
-    return Response(
-        content=data,
-        media_type="model/stl",
-        headers={"Content-Disposition": f'attachment; filename="{part}.stl"'},
-    )
+    return await _artifact_response(file_id, f"{part}.stl", "model/stl", f"{part}.stl")
@@ -0,0 +1,69 @@
+"""Coalesce identical concurrent requests into one computation.
+
+The first caller for a key starts the computation as a task; callers that arrive
+with the same key while it runs await that task instead of starting their own.
+Everyone gets the same result or the same exception. A caller that is cancelled
+(e.g. its client disconnected) stops waiting without cancelling the shared task,
+so the other callers are unaffected. Nothing is kept once the task finishes:
+a failure is never handed to later callers, they start a fresh computation.
+
+Flights are per process and per event loop.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger("flight")
+
+
+class _Flight:
+    __slots__ = ("task", "callers")
+
+    def __init__(self):
+        self.task = None
+        self.callers = 1
+
+
+class SingleFlight:
+    def __init__(self, name: str = "flight"):
+        self.name = name
+        self._flights: dict[str, _Flight] = {}
+        self.started = 0
+        self.joined = 0
+        self.failed = 0
+
+    async def run(self, key: str, fn, *args):
+        """Return (result of ``await fn(*args)``, number of callers that shared it)."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._execute(key, flight, fn, args))
+            self.started += 1
+        else:
+            flight.callers += 1
+            self.joined += 1
+            logger.debug("%s: joined %s (%d callers)", self.name, key, flight.callers)
+        # The caller count is final once the task is done: the flight is removed
+        # from the table before its result is set, so nobody can join later.
+        result = await asyncio.shield(flight.task)
+        return result, flight.callers
+
+    async def _execute(self, key: str, flight: _Flight, fn, args):
+        try:
+            return await fn(*args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            del self._flights[key]
+            if flight.callers > 1:
+                logger.info("%s: %s shared by %d callers", self.name, key, flight.callers)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "joined": self.joined,
+            "failed": self.failed,
+        }
@@ -0,0 +1,423 @@
+"""Process pool that runs CPU-bound generation off the event loop.
+
+OCCT and Pillow hold the GIL for most of a generation, so jobs run in separate
+worker processes. The pool has a fixed number of workers and a bounded queue:
+``run`` raises PoolFull immediately when all workers are busy and the queue is
+full, so the API can answer 503 with Retry-After instead of piling up requests.
+A job that exceeds its timeout gets its worker killed and replaced, and workers
+are recycled after a number of jobs to cap memory growth in long-lived OCCT
+processes. Job functions and their arguments must be picklable (see src/jobs.py).
+
+The API runs one pool per workload ("lane"), each with its own workers, queue
+bound and timeout, so a burst of slow 3D jobs cannot queue ahead of 2D emoji.
+A lane's ``priority`` is a nice increment for its workers: when lanes compete
+for CPU the kernel favours the lower value.
+
+Byte results of at least SHARED_MEMORY_MIN_BYTES are not pickled back: the worker
+copies them into a shared memory segment and only its name crosses the pipe. The
+API process receives a SharedBuffer and owns the segment from then on. Segment
+names carry the worker's pid, so when a worker is killed or crashes with a result
+still in flight, the pool unlinks whatever that worker left behind.
+
+A pool can be given a ``worker_stats`` function (picklable, like jobs). Workers
+call it after every job and send its result back with the job's result, so the
+API can report per-worker counters such as cache hit rates without running jobs
+of its own; ``worker_stats()`` returns the latest report of each live worker.
+"""
+import asyncio
+import logging
+import math
+import mmap
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+logger = logging.getLogger("pool")
+
+SHARED_MEMORY_MIN_BYTES = int(os.environ.get("SHARED_MEMORY_MIN_BYTES", str(64 * 1024)))
+
+# Where POSIX shared memory segments appear as files (Linux).
+_SEGMENT_DIR = "/dev/shm"
+
+
+def _segment_prefix(pid: int) -> str:
+    return f"emoji-maker-{pid}-"
+
+
+def _sweep_segments(pid: int) -> int:
+    """Unlink the segments a dead worker created but never handed over."""
+    prefix = _segment_prefix(pid)
+    try:
+        names = [n for n in os.listdir(_SEGMENT_DIR) if n.startswith(prefix)]
+    except FileNotFoundError:
+        return 0
+    swept = 0
+    for name in names:
+        try:
+            os.unlink(os.path.join(_SEGMENT_DIR, name))
+            swept += 1
+        except FileNotFoundError:
+            pass
+    return swept
+
+
+class PoolFull(Exception):
+    """Raised when every worker is busy and the queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Worker pool is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class _SharedHandle:
+    """What crosses the pipe instead of a large bytes result."""
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+    def __getstate__(self):
+        return self.name, self.size
+
+    def __setstate__(self, state):
+        self.name, self.size = state
+
+
+class SharedBuffer:
+    """A job result held in shared memory, owned by the API process.
+
+    ``view()`` returns a new read-only memoryview of the result for each reader.
+    The segment's name is unlinked as soon as it is mapped, so nothing outlives
+    the mapping: the memory is returned when ``release`` is called and no view
+    is left, or otherwise once the last view of it is garbage collected (for
+    instance when a response is dropped mid-stream).
+    """
+
+    def __init__(self, handle: _SharedHandle):
+        shm = shared_memory.SharedMemory(name=handle.name)
+        try:
+            # Map the segment ourselves: SharedMemory closes its mapping when it is
+            # garbage collected, which fails while served views still use it.
+            self._mmap = mmap.mmap(shm._fd, handle.size, access=mmap.ACCESS_READ)
+        finally:
+            shm.close()
+            shm.unlink()
+        self.name = handle.name
+        self._view = memoryview(self._mmap)
+        self.nbytes = handle.size
+
+    def view(self) -> memoryview:
+        """A view of the result that stays valid after ``release``."""
+        return self._view[:]
+
+    def release(self) -> None:
+        """Drop the owner's reference; views handed out keep the memory alive."""
+        if self._mmap is None:
+            return
+        mapping, self._mmap, self._view = self._mmap, None, None
+        try:
+            mapping.close()
+        except BufferError:
+            # Views are still in use; the mapping goes away with the last of them.
+            pass
+
+
+def _to_shared(value):
+    """Move a large bytes-like job result into shared memory (worker side)."""
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+        return value
+    size = memoryview(value).nbytes
+    if size < SHARED_MEMORY_MIN_BYTES:
+        return value
+    name = _segment_prefix(os.getpid()) + secrets.token_hex(8)
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    shm.buf[:size] = value
+    handle = _SharedHandle(shm.name, size)
+    shm.close()
+    # Ownership passes to the API process, which unlinks the segment on receipt
+    # (or sweeps it if this worker dies first); without this the tracker would
+    # unlink it when this worker is recycled.
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return handle
+
+
+def _worker_main(conn, initializer, priority=0, worker_stats=None):
+    # The parent handles Ctrl-C and shuts workers down explicitly.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if priority:
+        os.nice(priority)
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s [%(levelname)s] [worker %(process)d] %(name)s: %(message)s',
+    )
+    if initializer is not None:
+        initializer()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        fn, args = job
+        try:
+            ok, value = True, _to_shared(fn(*args))
+        except Exception as e:
+            ok, value = False, e
+        stats = worker_stats() if worker_stats is not None else None
+        try:
+            conn.send((ok, value, stats))
+        except Exception as e:
+            # The result or the job's exception is not picklable.
+            error = value if not ok else e
+            conn.send((False, RuntimeError(f"{type(error).__name__}: {error}"), stats))
+
+
+class _Worker:
+    def __init__(self, ctx, initializer, priority=0, worker_stats=None):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main,
+                                   args=(child_conn, initializer, priority, worker_stats),
+                                   daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.stats = None
+
+    def call(self, fn, args, timeout: float):
+        self.conn.send((fn, args))
+        if not self.conn.poll(timeout):
+            raise JobTimeout(f"Job exceeded {timeout:.0f}s")
+        try:
+            ok, value, stats = self.conn.recv()
+        except EOFError:
+            raise WorkerCrashed(f"Worker {self.process.pid} exited with {self.process.exitcode}")
+        self.jobs += 1
+        if stats is not None:
+            self.stats = stats
+        if not ok:
+            raise value
+        if isinstance(value, _SharedHandle):
+            return SharedBuffer(value)
+        return value
+
+    def stop(self, kill: bool = False, wait: bool = True) -> None:
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        if not wait:
+            # The worker exits on its own once it reads the stop message;
+            # multiprocessing reaps it when the next process starts.
+            self.conn.close()
+            return
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(self, size: int, max_queue: int, job_timeout: float,
+                 max_jobs_per_worker: int, initializer=None, name: str = "pool",
+                 priority: int = 0, worker_stats=None):
+        self.size = size
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.initializer = initializer
+        self.name = name
+        self.priority = priority
+        self.worker_stats_fn = worker_stats
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: list[_Worker] = []
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._avg_job_seconds = 1.0
+        self._avg_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.size,
+                                                thread_name_prefix=self.name)
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+        logger.info("%s: started %d workers (priority %d)", self.name, self.size, self.priority)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            workers, self._workers = self._workers, []
+        if executor is None:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        for worker in workers:
+            worker.stop()
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` in a worker process and return its result."""
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            if self._pending >= self.size + self.max_queue:
+                self.rejected += 1
+                raise PoolFull(self._retry_after())
+            self._pending += 1
+        future = self._executor.submit(self._run_job, fn, args, time.time())
+        # Count the job until it finishes or is dropped from the queue, even if the
+        # awaiting request is cancelled first.
+        future.add_done_callback(self._job_done)
+        return await asyncio.wrap_future(future)
+
+    def _job_done(self, future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": self.size,
+                "max_queue": self.max_queue,
+                "priority": self.priority,
+                "pending": self._pending,
+                "running": min(self._pending, self.size),
+                "queued": max(0, self._pending - self.size),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "recycled": self.recycled,
+                "avg_job_ms": round(self._avg_job_seconds * 1000, 1),
+                "avg_wait_ms": round(self._avg_wait_seconds * 1000, 1),
+                "max_wait_ms": round(self._max_wait_seconds * 1000, 1),
+            }
+
+    def worker_stats(self) -> list:
+        """The latest ``worker_stats`` report of each live worker that has run a job."""
+        with self._lock:
+            return [w.stats for w in self._workers if w.stats is not None]
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.initializer, self.priority, self.worker_stats_fn)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, kill: bool) -> _Worker:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            replacement = self._spawn()
+        worker.stop(kill=kill, wait=kill)
+        if kill:
+            # A result may have been in shared memory or in the pipe when it died.
+            swept = _sweep_segments(worker.process.pid)
+            if swept:
+                logger.warning("%s: unlinked %d shared memory segments of worker %d",
+                               self.name, swept, worker.process.pid)
+        return replacement
+
+    def _retry_after(self) -> int:
+        # Time for the queue ahead of a new request to drain, at the average job rate.
+        return max(1, math.ceil(self._avg_job_seconds * self._pending / self.size))
+
+    def _run_job(self, fn, args, submitted: float):
+        # One executor thread per worker, so an idle worker is always available here.
+        worker = self._idle.get()
+        t0 = time.time()
+        wait = t0 - submitted
+        with self._lock:
+            self._avg_wait_seconds = 0.8 * self._avg_wait_seconds + 0.2 * wait
+            self._max_wait_seconds = max(self._max_wait_seconds, wait)
+        try:
+            result = worker.call(fn, args, self.job_timeout)
+        except JobTimeout:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning("%s: %s timed out after %.0fs, killing worker %d",
+                           self.name, getattr(fn, "__name__", fn), self.job_timeout,
+                           worker.process.pid)
+            worker = self._replace(worker, kill=True)
+            raise
+        except WorkerCrashed:
+            with self._lock:
+                self.crashes += 1
+            logger.error("%s: worker %d crashed running %s", self.name,
+                         worker.process.pid, getattr(fn, "__name__", fn))
+            worker = self._replace(worker, kill=True)
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            if worker.jobs >= self.max_jobs_per_worker:
+                with self._lock:
+                    self.recycled += 1
+                worker = self._replace(worker, kill=False)
+            self._idle.put(worker)
+
+        elapsed = time.time() - t0
+        with self._lock:
+            self.completed += 1
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+        return result
+
+
+def create_pool(lane: str, initializer=None, size: int = None, max_queue: int = 16,
+                job_timeout: float = 60, max_jobs: int = 200, priority: int = 0,
+                worker_stats=None) -> WorkerPool:
+    """Build the pool for one lane, configured by WORKER_<LANE>_* environment variables.
+
+    POOL_SIZE, QUEUE_SIZE, JOB_TIMEOUT, MAX_JOBS and PRIORITY override the given
+    defaults, e.g. WORKER_3D_POOL_SIZE=2. The default size is min(4, cpu count).
+    """
+    prefix = f"WORKER_{lane.upper()}_"
+
+    def env(key, default):
+        return os.environ.get(prefix + key, str(default))
+
+    if size is None:
+        size = min(4, os.cpu_count() or 1)
+    return WorkerPool(
+        size=int(env("POOL_SIZE", size)),
+        max_queue=int(env("QUEUE_SIZE", max_queue)),
+        job_timeout=float(env("JOB_TIMEOUT", job_timeout)),
+        max_jobs_per_worker=int(env("MAX_JOBS", max_jobs)),
+        initializer=initializer,
+        name=lane,
+        priority=int(env("PRIORITY", priority)),
+        worker_stats=worker_stats,
+    )
@@ -0,0 +1,145 @@
+"""Test the structure of the multi-plate 3MF package."""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import zipfile
+from src.generator.generate_3d_text import Generate3DInput, generate_3d_text
+
+
+def test_meshes_written_once():
+    buf, _, _ = generate_3d_text(Generate3DInput(
+        text="AB", font="Omnes Medium", fontSize=24,
+        addBorder=True, fillBorder=True, exportFormat="3mf"))
+    zf = zipfile.ZipFile(buf)
+    objects = [n for n in zf.namelist() if n.startswith("3D/Objects/")]
+    assert objects == ["3D/Objects/object_1.model", "3D/Objects/object_2.model"]
+
+    main = zf.read("3D/3dmodel.model").decode()
+    paths = re.findall(r'p:path="([^"]+)" objectid="(\d+)"', main)
+    # The Text Only and Fill Only plates place the shared meshes through objects
+    # of their own, so no two plates use the same part id.
+    assert paths == [("/3D/Objects/object_1.model", "1"), ("/3D/Objects/object_2.model", "3"),
+                     ("/3D/Objects/object_1.model", "5"), ("/3D/Objects/object_2.model", "7")]
+    assert 'id="5"' in zf.read("3D/Objects/object_1.model").decode()
+    assert 'id="7"' in zf.read("3D/Objects/object_2.model").decode()
+    assert main.count("<item ") == 4
+    config = zf.read("Metadata/model_settings.config").decode()
+    assert sorted(re.findall(r'<part id="(\d+)"', config)) == ["1", "3", "5", "7"]
+
+
+def test_instanced_glyphs_match_merged_text():
+    import numpy as np
+    import trimesh
+    import xml.etree.ElementTree as ET
+    core = "{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}"
+    prod = "{http://schemas.microsoft.com/3dmanufacturing/production/2015/06}"
+
+    result = generate_3d_text(Generate3DInput(
+        text="AAAA\nABBA", font="Omnes Medium", fontSize=24, engine="mesh",
+        addBorder=False, scale=1.5, exportFormat="3mf", instanceGlyphs=True))[0]
+    merged = generate_3d_text(Generate3DInput(
+        text="AAAA\nABBA", font="Omnes Medium", fontSize=24, engine="mesh",
+        addBorder=False, scale=1.5, exportFormat="stl"))[0]
+
+    zf = zipfile.ZipFile(result)
+    objects = {}
+    placements = {}
+    for obj in ET.fromstring(zf.read("3D/Objects/object_1.model")).iter(core + "object"):
+        component = obj.find(f"{core}components/{core}component")
+        if component is not None:
+            # Repeated occurrences get an object of their own placing the shared mesh.
+            assert component.get("transform") is None
+            placements[obj.get("id")] = component.get("objectid")
+            continue
+        verts = [[float(v.get(a)) for a in "xyz"] for v in obj.iter(core + "vertex")]
+        faces = [[int(t.get(a)) for a in ("v1", "v2", "v3")] for t in obj.iter(core + "triangle")]
+        objects[obj.get("id")] = trimesh.Trimesh(verts, faces, process=False)
+    assert len(objects) == 2 and len(placements) == 6
+
+    parts = []
+    for comp in ET.fromstring(zf.read("3D/3dmodel.model")).iter(core + "component"):
+        assert comp.get(prod + "path") == "/3D/Objects/object_1.model"
+        offset = [float(v) for v in comp.get("transform").split()[9:]]
+        mesh_id = placements.get(comp.get("objectid"), comp.get("objectid"))
+        parts.append(objects[mesh_id].copy().apply_translation(offset))
+    assert len(parts) == 8
+    text = trimesh.util.concatenate(parts)
+
+    expected = trimesh.load(merged, file_type="stl")
+    print(f"instanced volume={text.volume:.2f} merged volume={expected.volume:.2f}")
+    assert abs(text.volume - expected.volume) < 1e-3 * expected.volume
+    assert np.abs(text.bounds - expected.bounds).max() < 1e-3
+
+    # Bambu Studio keys part settings on the part id: no two parts in the package
+    # may share one, within an object or across objects.
+    config = ET.fromstring(zf.read("Metadata/model_settings.config"))
+    ids = [part.get("id") for part in config.iter("part")]
+    assert len(ids) == len(set(ids)) == 8
+    assert set(ids) == set(placements) | set(objects)
+
+
+def test_package_is_valid_zip_with_shared_static_entries():
+    from src.generator.mf_package import TEMPLATE
+
+    buf, _, _ = generate_3d_text(Generate3DInput(
+        text="Hi", font="Omnes Medium", addBorder=False, engine="mesh", exportFormat="3mf"))
+    zf = zipfile.ZipFile(buf)
+    assert zf.testzip() is None
+    assert zf.namelist()[:2] == ["[Content_Types].xml", "_rels/.rels"]
+    assert zf.read("Metadata/filament_sequence.json") == b'{"plate_1": {"sequence": []}}'
+    if TEMPLATE.project_settings is not None:
+        info = zf.getinfo("Metadata/project_settings.config")
+        assert info.compress_size == len(TEMPLATE.project_settings.data)
+
+
+def test_result_round_trips_through_bytes():
+    from src.generator.generate_3d_text import Generate3DBothResult, generate_3d_both
+
+    result = generate_3d_both(Generate3DInput(
+        text="AA", font="Omnes Medium", engine="mesh", fillBorder=True,
+        scale=1.5, exportFormat="3mf", instanceGlyphs=True))
+    restored = Generate3DBothResult.from_bytes(result.to_bytes())
+    assert restored.input_data == result.input_data
+    assert restored.dimensions == result.dimensions
+    assert restored.text_stl.getvalue() == result.text_stl.getvalue()
+    assert restored.border_stl.getvalue() == result.border_stl.getvalue()
+    assert len(restored.glyphs.placements) == 2
+
+    def glyph_objects(buf):
+        xml = zipfile.ZipFile(buf).read("3D/Objects/object_1.model").decode()
+        return re.sub(r'p:UUID="[^"]+"', "", xml)
+
+    assert glyph_objects(restored.mf_buf) == glyph_objects(result.mf_buf)
+    assert Generate3DBothResult.read_summary(result.to_bytes()) == (result.dimensions, True)
+
+
+def test_materialize_job_builds_artifacts_from_geometry():
+    from src import jobs
+    from src.generator.generate_3d_text import generate_3d_both
+
+    result = generate_3d_both(Generate3DInput(
+        text="AA", font="Omnes Medium", engine="mesh", addBorder=False))
+    geometry = result.to_bytes()
+    assert jobs.materialize_3d(geometry, "text.stl") == result.text_stl.getvalue()
+    assert jobs.materialize_3d(geometry, "border.stl") is None
+
+
+def test_generation_key_ignores_presentation_fields():
+    from src.generator.generate_3d_text import DEFAULT_ENGINE, generation_key
+
+    base = Generate3DInput(text="Hi", font="Omnes Medium", exportFormat="3mf")
+    same = Generate3DInput(text="Hi", font="Omnes Medium", exportFormat="stl",
+                           color="#667EEA", engine=DEFAULT_ENGINE, fontSize=24)
+    assert generation_key(base) == generation_key(same)
+    assert generation_key(base) != generation_key(base.model_copy(update={"fontSize": 25.0}))
+
+
+def test_generation_key_depends_on_secret(monkeypatch):
+    from src.generator import generate_3d_text
+
+    data = Generate3DInput(text="Hi", font="Omnes Medium")
+    key = generate_3d_text.generation_key(data)
+    monkeypatch.setattr(generate_3d_text, "FILE_ID_SECRET", b"other secret")
+    assert generate_3d_text.generation_key(data) != key
@@ -0,0 +1,172 @@
+"""Test the byte budget, TTL and sharing of the artifact stores."""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+import pytest
+from src.artifact_store import DirectoryArtifactStore, MemoryArtifactStore, TieredArtifactStore
+
+
+def check_lru_and_budget(store):
+    store.put("a.stl", b"a" * 40)
+    store.put("b.stl", b"b" * 40)
+    time.sleep(0.02)
+    assert bytes(store.get("a.stl")) == b"a" * 40  # a is now most recently used
+    store.put("c.stl", b"c" * 40)  # over the 100 byte budget: evicts b
+    assert store.get("b.stl") is None
+    assert bytes(store.get("a.stl")) == b"a" * 40
+    assert bytes(store.get("c.stl")) == b"c" * 40
+    stats = store.stats()
+    print(stats)
+    assert stats["entries"] == 2 and stats["bytes"] == 80
+    assert stats["evictions"] == 1 and stats["misses"] == 1
+
+
+def test_memory_store_lru_and_budget():
+    check_lru_and_budget(MemoryArtifactStore(max_bytes=100, ttl=60))
+
+
+def test_directory_store_lru_and_budget(tmp_path):
+    check_lru_and_budget(DirectoryArtifactStore(str(tmp_path), max_bytes=100, ttl=60))
+
+
+def test_ttl_expiry(tmp_path):
+    for store in (MemoryArtifactStore(max_bytes=100, ttl=0.05),
+                  DirectoryArtifactStore(str(tmp_path), max_bytes=100, ttl=0.05)):
+        store.put("x.3mf", b"data")
+        time.sleep(0.1)
+        assert store.get("x.3mf") is None
+        assert store.stats()["expired"] == 1
+
+
+def test_directory_store_is_shared(tmp_path):
+    writer = DirectoryArtifactStore(str(tmp_path), max_bytes=1000, ttl=60)
+    reader = DirectoryArtifactStore(str(tmp_path), max_bytes=1000, ttl=60)
+    writer.put("id.text.stl", b"solid")
+    assert bytes(reader.get("id.text.stl")) == b"solid"
+    assert reader.get("../id.text.stl") is None
+
+
+def test_release_callbacks(tmp_path):
+    released = []
+    memory = MemoryArtifactStore(max_bytes=100, ttl=60)
+    memory.put("a.geometry", b"a" * 60, release=lambda: released.append("a"))
+    memory.put("b.geometry", b"b" * 60, release=lambda: released.append("b"))
+    assert released == ["a"]  # evicted over budget
+    memory.put("b.geometry", b"c", release=lambda: released.append("c"))
+    assert released == ["a", "b"]  # replaced
+
+    released.clear()
+    directory = DirectoryArtifactStore(str(tmp_path), max_bytes=100, ttl=60)
+    directory.put("d.geometry", b"d", release=lambda: released.append("d"))
+    assert released == ["d"] and bytes(directory.get("d.geometry")) == b"d"
+
+
+def test_tiered_store_spills_to_disk(tmp_path):
+    released = []
+    spill = DirectoryArtifactStore(str(tmp_path), max_bytes=1000, ttl=60)
+    store = TieredArtifactStore(max_bytes=100, ttl=60, spill=spill)
+    store.put("a.geometry", b"a" * 60, release=lambda: released.append("a"))
+    store.put("b.geometry", b"b" * 60)
+    # a no longer fits in memory: written to disk, then its buffer released.
+    assert released == ["a"]
+    assert bytes(store.get("a.geometry")) == b"a" * 60
+    assert bytes(store.get("b.geometry")) == b"b" * 60
+    stats = store.stats()
+    assert stats["entries"] == 1 and stats["spill"]["entries"] == 1
+
+
+def test_memory_store_views_survive_eviction():
+    released = []
+    store = MemoryArtifactStore(max_bytes=100, ttl=60)
+    store.put("a.geometry", memoryview(b"a" * 60), release=lambda: released.append("a"))
+    view = store.get("a.geometry")
+    store.put("b.geometry", b"b" * 60)
+    assert released == ["a"]
+    view.release()  # a reader releasing its view does not affect other readers
+    store.put("a.geometry", memoryview(b"c" * 10))
+    first, second = store.get("a.geometry"), store.get("a.geometry")
+    assert first is not second
+    first.release()
+    assert bytes(second) == b"c" * 10
+
+
+def check_sink(store):
+    sink = store.sink("a.3mf")
+    for chunk in (b"ab", b"", b"cd"):
+        sink.write(chunk)
+    sink.commit()
+    assert bytes(store.get("a.3mf")) == b"abcd"
+
+    sink = store.sink("b.3mf")
+    sink.write(b"partial")
+    sink.abort()
+    assert store.get("b.3mf") is None
+    assert store.stats()["puts"] == 1
+
+
+def test_sinks_store_streamed_artifacts(tmp_path):
+    check_sink(MemoryArtifactStore(max_bytes=100, ttl=60))
+    check_sink(DirectoryArtifactStore(str(tmp_path), max_bytes=100, ttl=60))
+    # Nothing but the committed artifact is left in the directory.
+    assert os.listdir(tmp_path) == ["a.3mf"]
+
+
+def test_memory_sink_releases_mapping_on_eviction():
+    store = MemoryArtifactStore(max_bytes=10, ttl=60)
+    sink = store.sink("a.3mf")
+    sink.write(b"a" * 8)
+    sink.commit()
+    view = store.get("a.3mf")
+    store.put("b.3mf", b"b" * 8)  # evicts a while its view is still held
+    assert store.get("a.3mf") is None
+    assert bytes(view) == b"a" * 8
+
+
+def test_directory_store_scans_only_when_over_budget(tmp_path, monkeypatch):
+    store = DirectoryArtifactStore(str(tmp_path), max_bytes=100, ttl=60)
+    scans = []
+    scan = store._scan
+    monkeypatch.setattr(store, "_scan", lambda: scans.append(1) or scan())
+    for i in range(4):
+        store.put(f"{i}.stl", b"x" * 20)
+        time.sleep(0.01)
+    assert scans == []
+    store.put("4.stl", b"x" * 30)  # 110 bytes: evicts down to 90
+    assert len(scans) == 1
+    assert store.get("0.stl") is None and store.get("1.stl") is not None
+    assert store.stats()["bytes"] == 90
+    store.close()
+
+
+def test_directory_store_sweeps_expired_files(tmp_path):
+    store = DirectoryArtifactStore(str(tmp_path), max_bytes=1000, ttl=0.05, sweep_interval=0.05)
+    store.put("x.3mf", b"data")
+    time.sleep(0.3)
+    assert os.listdir(tmp_path) == []
+    assert store.metrics.expired == 1
+    store.close()
+
+
+def test_directory_stats_do_not_scan(tmp_path, monkeypatch):
+    store = DirectoryArtifactStore(str(tmp_path), max_bytes=1000, ttl=60)
+    store.put("a.stl", b"a" * 10)
+    store.put("b.stl", b"b" * 20)
+    monkeypatch.setattr(store, "_scan", lambda: pytest.fail("stats scanned the directory"))
+    stats = store.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 30
+    store.close()
+
+
+def test_directory_store_sweeps_abandoned_temp_files(tmp_path):
+    abandoned = tmp_path / ".abandoned.tmp"
+    abandoned.write_bytes(b"partial")
+    old = time.time() - 120
+    os.utime(abandoned, (old, old))
+    (tmp_path / ".writing.tmp").write_bytes(b"partial")
+    store = DirectoryArtifactStore(str(tmp_path), max_bytes=1000, ttl=60, sweep_interval=0.05)
+    store.put("x.3mf", b"data")
+    assert sorted(os.listdir(tmp_path)) == [".writing.tmp", "x.3mf"]
+    store.close()
@@ -0,0 +1,59 @@
+"""Test the bounded LRU cache used for glyphs and other shared state."""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.generator.cache import LRUCache
+
+
+def test_evicts_least_recently_used_by_entries():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_by_byte_budget():
+    cache = LRUCache(max_entries=100, max_bytes=10)
+    cache.put("a", "x", size=6)
+    cache.put("b", "y", size=6)
+
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 6
+
+
+def test_get_or_create_counts_hits_and_misses():
+    cache = LRUCache(max_entries=10)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_create("k", factory) == "value"
+    assert cache.get_or_create("k", factory) == "value"
+
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_merge_stats_sums_processes():
+    from src.generator.cache import merge_stats
+
+    a, b = LRUCache(max_entries=10, name="a"), LRUCache(max_entries=10, name="a")
+    a.put("x", 1)
+    a.get("x")
+    b.get("y")
+    merged = merge_stats([{"a": a.stats()}, {"a": b.stats()}])["a"]
+    assert merged["processes"] == 2 and merged["entries"] == 1
+    assert merged["hits"] == 1 and merged["misses"] == 1 and merged["hit_rate"] == 0.5
+    assert merged["max_entries"] == 10
+    assert merge_stats([]) == {}
@@ -80,6 +80,44 @@ def test_no_fill_same_depth():
     print("PASS: border frame matches text depth")
 
 
+def test_border_tweak_reuses_upstream_stages():
+    from src.generator import generate_3d_text as g3d
+
+    base = Generate3DInput(text="AB", font="Omnes Medium", fontSize=24, gap=5,
+                           addOutline=True, addBorder=True, fillBorder=True,
+                           engine="occt", exportFormat="stl")
+    tweaked = base.model_copy(update={"borderPaddingLeft": 6.0, "scale": 2.0})
+
+    g3d._stage_cache.clear()
+    fresh = generate_3d_both(tweaked)
+
+    g3d._stage_cache.clear()
+    generate_3d_both(base)
+    hits = g3d.stage_cache_stats()["hits"]
+    cached = generate_3d_both(tweaked)
+    # layout, cutter and outline hit; border and both meshes are rebuilt.
+    assert g3d.stage_cache_stats()["hits"] - hits == 3
+
+    assert cached.dimensions == fresh.dimensions
+    assert measure_z_depth(cached.border_stl) == measure_z_depth(fresh.border_stl)
+
+
+def test_stage_keys_ignore_downstream_inputs():
+    from src.generator.generate_3d_text import _stage_keys
+
+    base = Generate3DInput(text="AB", font="Omnes Medium", addBorder=True)
+    keys = _stage_keys(base, "font.ttf")
+    padded = _stage_keys(base.model_copy(update={"borderPaddingTop": 9.0,
+                                                 "color": "#000000", "scale": 3.0}),
+                         "font.ttf")
+    assert padded["outline"] == keys["outline"]
+    assert padded["border"] != keys["border"]
+    # Keychain settings only matter for a filled plate with a hole.
+    corner = _stage_keys(base.model_copy(update={"keychainCorner": "bottom-right"}),
+                         "font.ttf")
+    assert corner == keys
+
+
 if __name__ == "__main__":
     test_fill_plate_thinner_than_text()
     test_no_fill_same_depth()
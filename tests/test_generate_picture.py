@@ -0,0 +1,130 @@
+"""Test text fitting and rendering of the 2D emoji generator."""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from src.generator.generate_picture import (FONT_DELIVEROO_SEMIBOLD, FONT_SIZE_INITIAL,
+                                            FONT_WOLT_COND_BLACK, fit_text,
+                                            fonts_with_size, image_height, image_width)
+
+
+def step_down_fit(font_path, text, margin, font_size=FONT_SIZE_INITIAL):
+    """The original linear search of generate_image."""
+    img_draw = ImageDraw.Draw(Image.new("RGBA", (image_width, image_height)))
+    while font_size > 1:
+        bbox = img_draw.textbbox((0, 0), text, fonts_with_size(font_path, font_size))
+        if bbox[-2] + margin <= image_width and bbox[-1] + margin <= image_height:
+            return font_size, (image_width - bbox[-2]) / 2, (image_height - bbox[-1]) / 2
+        font_size -= 2
+    return font_size, 0, 0
+
+
+def test_fit_text_matches_step_down_search():
+    for font_path in (FONT_WOLT_COND_BLACK, FONT_DELIVEROO_SEMIBOLD):
+        for text in ("", "A", "LGTM", "SHIP\nIT", "THIS IS A VERY LONG EMOJI TEXT"):
+            for margin in (0, 40):
+                assert fit_text(font_path, text, margin) == step_down_fit(font_path, text, margin)
+
+
+def test_fit_text_respects_max_size():
+    size, _, _ = fit_text(FONT_WOLT_COND_BLACK, "A", 0, max_size=40)
+    assert size == 40
+    assert fit_text(FONT_WOLT_COND_BLACK, "A", 0, max_size=0) == (0, 0, 0)
+    assert fit_text(FONT_WOLT_COND_BLACK, "A", 1000) == (0, 0, 0)
+
+
+def test_fonts_are_pooled_per_path_and_size():
+    from src.generator.generate_picture import font_pool_stats
+
+    font = fonts_with_size(FONT_WOLT_COND_BLACK, 33)
+    hits = font_pool_stats()["hits"]
+    assert fonts_with_size(FONT_WOLT_COND_BLACK, 33) is font
+    assert fonts_with_size(FONT_WOLT_COND_BLACK, 35) is not font
+    assert font_pool_stats()["hits"] == hits + 1
+
+
+def test_preloaded_sizes_are_the_first_probes_of_fit_text(monkeypatch):
+    from src.generator import generate_picture
+
+    preloaded = set(generate_picture._first_probes(3))
+    assert len(preloaded) == 7
+    for text in ("A", "LGTM", "THIS IS A VERY LONG EMOJI TEXT"):
+        probed = []
+        measure = generate_picture._text_bbox
+        monkeypatch.setattr(generate_picture, "_text_bbox",
+                            lambda path, size, t: probed.append(size) or measure(path, size, t))
+        fit_text(FONT_WOLT_COND_BLACK, text, 0)
+        assert set(probed[:3]) <= preloaded
+
+
+def test_typewriter_frames_match_full_redraw():
+    from src.generator.generate_picture import (COLOR_RGB_WOLT, GenerateInput,
+                                                typewriter_frames)
+
+    text = "SHIP IT"
+    frames = list(typewriter_frames(GenerateInput(text=text, gif=True, margin=20)))
+    assert len(frames) == len(text) + 1
+
+    font_size = FONT_SIZE_INITIAL
+    for i, frame in enumerate(frames):
+        font_size, x, y = step_down_fit(FONT_WOLT_COND_BLACK, text[:i], 20, font_size)
+        expected = Image.new("RGBA", (image_width, image_height), (255, 255, 255, 0))
+        ImageDraw.Draw(expected).text((x, y), text[:i], align="center", fill=COLOR_RGB_WOLT,
+                                      font=fonts_with_size(FONT_WOLT_COND_BLACK, font_size))
+        assert frame.tobytes() == expected.tobytes()
+
+
+def test_make_gif_has_one_frame_per_prefix():
+    from src.generator.generate_picture import GenerateInput, make_gif
+
+    gif = Image.open(make_gif(GenerateInput(text="LGTM", gif=True)))
+    assert gif.n_frames == 5
+
+
+def test_delta_gif_shows_the_same_frames():
+    from PIL import ImageSequence
+    from src.generator.generate_picture import GenerateInput, make_gif, typewriter_frames
+
+    data = GenerateInput(text="LGTM", gif=True)
+    delta = make_gif(data)
+    full = make_gif(data.model_copy(update={"gifEncoding": "full"}))
+    assert len(delta.getvalue()) < len(full.getvalue())
+
+    decoded = [f.convert("RGBA") for f in ImageSequence.Iterator(Image.open(delta))]
+    frames = list(typewriter_frames(data))
+    assert len(decoded) == len(frames)
+    for shown, frame in zip(decoded, frames):
+        # GIF transparency is binary: every covered pixel is opaque, the rest clear.
+        assert shown.getchannel("A").point(lambda a: a > 0).tobytes() == \
+            frame.getchannel("A").point(lambda a: a > 0).tobytes()
+
+
+def test_animation_formats_keep_every_frame():
+    from PIL import ImageSequence
+    from src.generator.generate_picture import GenerateInput, make_animation, typewriter_frames
+
+    data = GenerateInput(text="LGTM", gif=True)
+    frames = list(typewriter_frames(data))
+    for fmt, pil_format in (("webp", "WEBP"), ("apng", "PNG")):
+        image = Image.open(make_animation(data.model_copy(
+            update={"format": fmt, "webpLossless": True})))
+        assert image.format == pil_format
+        decoded = [f.convert("RGBA") for f in ImageSequence.Iterator(image)]
+        assert len(decoded) == len(frames)
+        # Both formats are lossless here and keep partial alpha.
+        assert decoded[-1].getchannel("A").tobytes() == frames[-1].getchannel("A").tobytes()
+
+
+def test_image_key_ignores_settings_of_other_formats():
+    from src.generator.generate_picture import GenerateInput, image_key
+
+    gif = GenerateInput(text="Hi", gif=True)
+    assert image_key(gif) == image_key(gif.model_copy(update={"webpQuality": 10}))
+    webp = gif.model_copy(update={"format": "webp"})
+    assert image_key(webp) != image_key(gif)
+    assert image_key(webp) == image_key(webp.model_copy(update={"gifEncoding": "full"}))
+    assert image_key(webp) != image_key(webp.model_copy(update={"webpQuality": 10}))
+    still = GenerateInput(text="Hi")
+    assert image_key(still) == image_key(still.model_copy(update={"format": "apng"}))
@@ -0,0 +1,32 @@
+"""Test that font-outline polygons match the glyphs CadQuery builds."""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cadquery as cq
+from src.generator.font_manager import get_font_path
+from src.generator.glyph_outline import glyph_polygon
+
+
+def test_outline_matches_occt_glyph():
+    font_path = get_font_path("Omnes Medium")
+    for char in "AgQ%":
+        face = cq.Compound.makeText(char, 24, 0, fontPath=font_path)
+        bb = face.BoundingBox()
+        poly = glyph_polygon(font_path, char, 24)
+
+        minx, miny, maxx, maxy = poly.bounds
+        print(f"{char}: area {poly.area:.3f} vs {face.Area():.3f}")
+        assert abs(poly.area - face.Area()) < 0.01 * face.Area()
+        assert abs(minx - bb.xmin) < 0.02 and abs(maxx - bb.xmax) < 0.02
+        assert abs(miny - bb.ymin) < 0.02 and abs(maxy - bb.ymax) < 0.02
+
+
+def test_outline_keeps_counters_as_holes():
+    poly = glyph_polygon(get_font_path("Omnes Medium"), "O", 24)
+    assert poly.geom_type == "Polygon"
+    assert len(poly.interiors) == 1
+
+
+def test_unknown_glyph_returns_none():
+    assert glyph_polygon(get_font_path("Omnes Medium"), "中", 24) is None
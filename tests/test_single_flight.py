@@ -0,0 +1,70 @@
+"""Test coalescing of identical concurrent requests."""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+import pytest
+from src.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value * 2
+
+    async def burst():
+        return await asyncio.gather(
+            flights.run("a", compute, 1), flights.run("a", compute, 1),
+            flights.run("b", compute, 5))
+
+    results = asyncio.run(burst())
+    assert results == [(2, 2), (2, 2), (10, 1)]
+    assert calls == [1, 5]
+    assert flights.stats()["joined"] == 1 and flights.stats()["in_flight"] == 0
+
+
+def test_failures_are_shared_but_not_cached():
+    flights = SingleFlight()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        await asyncio.sleep(0.05)
+        if len(attempts) == 1:
+            raise ValueError("first attempt fails")
+        return "ok"
+
+    async def scenario():
+        results = await asyncio.gather(flights.run("k", flaky), flights.run("k", flaky),
+                                       return_exceptions=True)
+        return results, await flights.run("k", flaky)
+
+    results, retry = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retry == ("ok", 1)
+    assert len(attempts) == 2
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(flights.run("k", compute))
+        second = asyncio.ensure_future(flights.run("k", compute))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == ("done", 2)
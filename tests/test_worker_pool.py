@@ -0,0 +1,163 @@
+"""Test queueing, timeouts and recycling of the worker process pool."""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import math
+import operator
+import time
+
+import pytest
+from src.worker_pool import JobTimeout, PoolFull, WorkerPool
+
+
+def make_pool(**kwargs):
+    options = dict(size=1, max_queue=0, job_timeout=10, max_jobs_per_worker=100)
+    options.update(kwargs)
+    return WorkerPool(**options)
+
+
+def test_runs_jobs_and_propagates_errors():
+    pool = make_pool()
+    try:
+        assert asyncio.run(pool.run(operator.add, 2, 3)) == 5
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(math.sqrt, -1))
+        assert pool.stats()["completed"] == 1 and pool.stats()["failed"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_rejects_when_queue_full():
+    pool = make_pool()
+
+    async def burst():
+        return await asyncio.gather(
+            pool.run(time.sleep, 0.5), pool.run(time.sleep, 0.5), return_exceptions=True)
+
+    try:
+        results = asyncio.run(burst())
+        assert results[0] is None
+        assert isinstance(results[1], PoolFull) and results[1].retry_after >= 1
+        assert pool.stats()["rejected"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_kills_and_respawns_worker():
+    pool = make_pool(job_timeout=0.5)
+    try:
+        before = asyncio.run(pool.run(os.getpid))
+        with pytest.raises(JobTimeout):
+            asyncio.run(pool.run(time.sleep, 5))
+        after = asyncio.run(pool.run(os.getpid))
+        assert after != before
+        assert pool.stats()["timeouts"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_recycles_worker_after_max_jobs():
+    pool = make_pool(max_jobs_per_worker=2)
+    try:
+        pids = [asyncio.run(pool.run(os.getpid)) for _ in range(3)]
+        print(pids)
+        assert pids[0] == pids[1] != pids[2]
+        assert pool.stats()["recycled"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_large_results_come_back_through_shared_memory():
+    from multiprocessing import shared_memory
+    from src.worker_pool import SHARED_MEMORY_MIN_BYTES, SharedBuffer
+
+    pool = make_pool()
+    try:
+        small = asyncio.run(pool.run(operator.mul, b"ab", 10))
+        assert small == b"ab" * 10
+        n = SHARED_MEMORY_MIN_BYTES
+        shared = asyncio.run(pool.run(operator.mul, b"ab", n))
+        assert isinstance(shared, SharedBuffer)
+        assert shared.nbytes == 2 * n and shared.view() == b"ab" * n
+        # Unlinked on receipt: the mapping alone keeps the bytes alive.
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=shared.name)
+        view = shared.view()
+        shared.release()
+        shared.release()
+        # A view handed out before release stays readable.
+        assert bytes(view[:4]) == b"abab"
+    finally:
+        pool.shutdown()
+
+
+def share_and_hang(n):
+    from src.worker_pool import _to_shared
+    handle = _to_shared(b"x" * n)
+    time.sleep(5)
+    return handle
+
+
+def test_timeout_unlinks_segments_of_killed_worker():
+    from src.worker_pool import SHARED_MEMORY_MIN_BYTES, _segment_prefix
+
+    if not os.path.isdir("/dev/shm"):
+        pytest.skip("no /dev/shm")
+    pool = make_pool(job_timeout=1)
+    try:
+        pid = asyncio.run(pool.run(os.getpid))
+        with pytest.raises(JobTimeout):
+            asyncio.run(pool.run(share_and_hang, SHARED_MEMORY_MIN_BYTES))
+        assert not [n for n in os.listdir("/dev/shm") if n.startswith(_segment_prefix(pid))]
+    finally:
+        pool.shutdown()
+
+
+def test_lanes_are_independent(monkeypatch):
+    from src.worker_pool import create_pool
+
+    monkeypatch.setenv("WORKER_SLOW_QUEUE_SIZE", "0")
+    slow = create_pool("slow", size=1, job_timeout=10, priority=5)
+    fast = create_pool("fast", size=1, job_timeout=10)
+    assert slow.max_queue == 0 and slow.name == "slow"
+
+    async def mixed():
+        busy = asyncio.ensure_future(slow.run(time.sleep, 1))
+        await asyncio.sleep(0.3)  # let the slow lane's job start
+        with pytest.raises(PoolFull):
+            await slow.run(os.getpid)
+        t0 = time.time()
+        niceness = await fast.run(os.nice, 0)
+        fast_elapsed = time.time() - t0
+        await busy
+        return niceness, fast_elapsed, await slow.run(os.nice, 0)
+
+    try:
+        slow.start()
+        fast.start()
+        fast_nice, fast_elapsed, slow_nice = asyncio.run(mixed())
+        assert fast_elapsed < 0.5
+        assert slow_nice - fast_nice == 5
+        stats = slow.stats()
+        print(stats)
+        assert stats["priority"] == 5 and stats["max_wait_ms"] >= 0
+    finally:
+        slow.shutdown()
+        fast.shutdown()
+
+
+def test_worker_stats_come_back_with_job_results():
+    pool = make_pool(size=2, worker_stats=os.getpid)
+    try:
+        assert pool.worker_stats() == []
+        pid = asyncio.run(pool.run(os.getpid))
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(math.sqrt, -1))
+        assert pid in pool.worker_stats()
+        # Reports ride along with jobs; collecting them runs nothing on the lane.
+        stats = pool.stats()
+        assert stats["completed"] == 1 and stats["failed"] == 1
+    finally:
+        pool.shutdown()
@@ -7,6 +7,7 @@ interface FormData {
   text: string;
   margin: number;
   gif: boolean;
+  format: 'gif' | 'webp' | 'apng';
   loop: boolean;
   frameDelay: number;
   hdr: boolean;
@@ -19,6 +20,7 @@ const EmojiGenerator: React.FC = () => {
     text: '',
     margin: 0,
     gif: false,
+    format: 'gif',
     loop: true,
     frameDelay: 100,
     hdr: false,
@@ -180,6 +182,19 @@ const EmojiGenerator: React.FC = () => {
 
         {formData.gif && (
           <div className="gif-settings">
+            <div className="form-group">
+              <label htmlFor="format">Format</label>
+              <select
+                id="format"
+                value={formData.format}
+                onChange={(e) => setFormData({ ...formData, format: e.target.value as FormData['format'] })}
+              >
+                <option value="gif">GIF</option>
+                <option value="webp">WebP</option>
+                <option value="apng">APNG</option>
+              </select>
+            </div>
+
             <div className="form-group">
               <label htmlFor="loop">Loop</label>
               <input
@@ -210,7 +225,7 @@ const EmojiGenerator: React.FC = () => {
           <img src={imageUrl} alt="Generated emoji" />
           <a
             href={imageUrl}
-            download={`${formData.text.split('\n').join('-')}.${formData.gif ? 'gif' : 'png'}`}
+            download={`${formData.text.split('\n').join('-')}.${formData.gif ? (formData.format === 'apng' ? 'png' : formData.format) : 'png'}`}
             className="download-link"
           >
             Download